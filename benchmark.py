@@ -0,0 +1,196 @@
+"""
+Benchmarks for the data pipeline in core.py.
+
+Usage:
+    python benchmark.py filters --rows 1000000 10000000
+    python benchmark.py excel --rows 10000 100000
+    python benchmark.py pdf --rows 1000 10000
+"""
+
+import argparse
+import io
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+import core
+
+
+def make_flights(rows: int, days: int = 365) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Build a processed synthetic flight frame with roughly the requested number of rows.
+
+    Args:
+        rows: Approximate number of flights
+        days: Number of days the flights are spread over
+
+    Returns:
+        Tuple of (processed flight data DataFrame, insights dictionary)
+    """
+    per_day = max(rows // (days + 1), 10)
+    df = core.generate_sample_data(days, min_flights=per_day, max_flights=per_day)
+    return core.process_data(df)
+
+
+def time_call(func: Callable, repeat: int = 3) -> float:
+    """
+    Return the best wall-clock time of several calls.
+
+    Args:
+        func: Zero-argument callable to time
+        repeat: Number of runs
+
+    Returns:
+        Best time in seconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def chained_filters(df: pd.DataFrame, filters: Dict) -> pd.DataFrame:
+    """
+    Reference implementation: the sequential mask-and-copy filtering main() used to do.
+    """
+    if filters['departure_city'] != "All":
+        df = df[df['departure_city'] == filters['departure_city']]
+    if filters['destination_city'] != "All":
+        df = df[df['destination_city'] == filters['destination_city']]
+    df['date'] = pd.to_datetime(df['date'])
+    df = df[(df['date'].dt.date >= filters['start_date']) & (df['date'].dt.date <= filters['end_date'])]
+    df = df[(df['price'] >= filters['price_range'][0]) & (df['price'] <= filters['price_range'][1])]
+    if filters['airline'] != "All":
+        df = df[df['airline'] == filters['airline']]
+    df = df[(df['occupancy_rate'] >= filters['occupancy_range'][0]) & (df['occupancy_rate'] <= filters['occupancy_range'][1])]
+    return df
+
+
+def bench_filters(row_counts: List[int]) -> None:
+    """
+    Compare chained boolean masks, the single-pass mask and the indexed filter engine.
+    """
+    today = datetime.now().date()
+    filters = {
+        'departure_city': "All",
+        'destination_city': "All",
+        'start_date': today - timedelta(days=90),
+        'end_date': today,
+        'price_range': (250.0, 900.0),
+        'airline': "Delta",
+        'occupancy_range': (30.0, 95.0)
+    }
+
+    print(f"{'rows':>12} {'chained (s)':>12} {'single-pass (s)':>16} {'indexed (s)':>12} {'speedup':>8}")
+    for rows in row_counts:
+        df, insights = make_flights(rows)
+        chained = time_call(lambda: chained_filters(df.copy(deep=False), filters))
+        single = time_call(lambda: core.apply_filters(df, filters))
+        indexed = time_call(lambda: core.apply_filters(df, filters, insights['index']))
+        assert len(chained_filters(df.copy(deep=False), filters)) == len(core.apply_filters(df, filters)[0])
+        assert core.apply_filters(df, filters)[0].equals(core.apply_filters(df, filters, insights['index'])[0])
+        print(f"{len(df):>12,} {chained:>12.3f} {single:>16.3f} {indexed:>12.3f} {chained / indexed:>7.1f}x")
+
+
+def pandas_excel_export(df: pd.DataFrame) -> bytes:
+    """
+    Reference implementation: the pd.ExcelWriter export display_tables used to do.
+    """
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Flight Data', index=False)
+    return buffer.getvalue()
+
+
+def bench_excel(row_counts: List[int]) -> None:
+    """
+    Compare write-only Excel export throughput with pd.ExcelWriter.
+    """
+    print(f"{'rows':>12} {'ExcelWriter (rows/s)':>21} {'write-only (rows/s)':>20} {'speedup':>8}")
+    for rows in row_counts:
+        df, _ = make_flights(rows)
+        df = df.iloc[:rows]
+        reference = time_call(lambda: pandas_excel_export(df), repeat=1)
+        write_only = time_call(lambda: core.export_excel({'Flight Data': df}), repeat=1)
+        print(f"{len(df):>12,} {len(df) / reference:>21,.0f} {len(df) / write_only:>20,.0f} {reference / write_only:>7.1f}x")
+
+
+def naive_pdf_table(df: pd.DataFrame) -> bytes:
+    """
+    Reference implementation: the iterrows-built, auto-sized table the PDF export used to do.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    table_data = [list(df.columns)]
+    for _, row in df.iterrows():
+        table_data.append([str(val) for val in row.values])
+    table = Table(table_data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.black)
+    ]))
+    doc.build([Paragraph("Flights", getSampleStyleSheet()['Heading1']), table])
+    return buffer.getvalue()
+
+
+def pdf_table(df: pd.DataFrame) -> bytes:
+    """
+    Render the same table with the report builder's table helper and cached styles.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    doc.build([Paragraph("Flights", core.get_pdf_styles()['heading1']), core.pdf_data_table(df, doc.width)])
+    return buffer.getvalue()
+
+
+def bench_pdf(row_counts: List[int]) -> None:
+    """
+    Compare PDF table rendering of the report builder with an iterrows-built table.
+    """
+    columns = ['date', 'route', 'airline', 'flight_number', 'price', 'occupancy_rate', 'revenue']
+    print(f"{'rows':>12} {'iterrows table (s)':>19} {'report builder (s)':>19} {'rows/s':>10} {'speedup':>8}")
+    for rows in row_counts:
+        df, _ = make_flights(rows)
+        df = df[columns].iloc[:rows]
+        reference = time_call(lambda: naive_pdf_table(df), repeat=1)
+        builder = time_call(lambda: pdf_table(df), repeat=1)
+        print(f"{len(df):>12,} {reference:>19.2f} {builder:>19.2f} {len(df) / builder:>10,.0f} {reference / builder:>7.1f}x")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the airline data pipeline")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    filters_parser = subparsers.add_parser('filters', help="indexed and single-pass filter engines vs chained masks")
+    filters_parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+
+    excel_parser = subparsers.add_parser('excel', help="write-only Excel export vs pd.ExcelWriter")
+    excel_parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+
+    pdf_parser = subparsers.add_parser('pdf', help="PDF report tables vs an iterrows-built table")
+    pdf_parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000])
+
+    args = parser.parse_args()
+    if args.benchmark == 'filters':
+        bench_filters(args.rows)
+    elif args.benchmark == 'excel':
+        bench_excel(args.rows)
+    elif args.benchmark == 'pdf':
+        bench_pdf(args.rows)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,188 @@
+"""
+Headless batch runs of the airline analysis pipeline (e.g. nightly from cron).
+
+Fetches flights for a date range, processes them and writes the requested
+exports without starting Streamlit, then prints how long each stage took.
+
+Usage:
+    python cli.py --start 2024-06-01 --end 2024-06-30 --format csv excel pdf parquet
+    python cli.py --days 2 --format csv.gz --output-dir /var/exports --sample
+    python cli.py --start 2024-01-01 --end 2024-06-30 --backfill --format parquet
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import core
+
+def parse_date(value: str) -> date:
+    """
+    Parse a YYYY-MM-DD command-line date.
+    """
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}' (expected YYYY-MM-DD)")
+
+def clip_to_window(df: pd.DataFrame, start_date: date, end_date: date) -> pd.DataFrame:
+    """
+    Keep the flights between two dates (inclusive).
+    
+    Args:
+        df: Flight data
+        start_date: First day to keep
+        end_date: Last day to keep
+        
+    Returns:
+        DataFrame restricted to the window
+    """
+    dates = pd.to_datetime(df['date']).to_numpy()
+    in_window = (dates >= pd.Timestamp(start_date).to_datetime64()) & (dates < (pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_datetime64())
+    return df[in_window].reset_index(drop=True)
+
+def write_export(df: pd.DataFrame, insights: Dict, format_type: str, path: str) -> int:
+    """
+    Write one export file, replacing any previous file atomically.
+    
+    Args:
+        df: Processed flight data
+        insights: Insights of the flights
+        format_type: Key of core.EXPORT_FORMATS
+        path: Destination file path
+        
+    Returns:
+        Size of the written file in bytes
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as target:
+            core.write_report(df, insights, target, format_type)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+def run_batch(start_date: date, end_date: date, formats: List[str], output_dir: str,
+              sample: bool = False, prefix: str = 'airline_analysis',
+              backfill: bool = False) -> Tuple[List[Tuple[str, float, str]], int]:
+    """
+    Fetch, process and export one date range.
+    
+    Args:
+        start_date: First day of the window
+        end_date: Last day of the window (inclusive)
+        formats: Keys of core.EXPORT_FORMATS to write
+        output_dir: Directory receiving the export files
+        sample: Use generated sample data instead of querying the providers
+        prefix: File name prefix of the exports
+        backfill: Store the OpenSky history of the window before fetching
+        
+    Returns:
+        Tuple of (timings as (stage, seconds, detail) rows, number of failed exports)
+        
+    Raises:
+        core.NoFlightData: If the window holds no real flights (without sample)
+    """
+    timings = []
+    
+    if backfill and not sample:
+        started = time.perf_counter()
+        slices, _ = core.backfill_duration(start_date, end_date)
+        backfill_df = core.backfill_opensky_data(start_date, end_date)
+        stored = len(backfill_df) if backfill_df is not None else 0
+        timings.append(('backfill', time.perf_counter() - started, f"{stored:,} flights from {slices:,} intervals"))
+    
+    started = time.perf_counter()
+    if sample:
+        days = max((datetime.now().date() - start_date).days, 1)
+        raw_df = core.generate_sample_data(days)
+    else:
+        # Made-up flights must never be exported as real analysis
+        raw_df = core.fetch_flight_data(start_date, end_date, allow_sample=False)
+    raw_df = clip_to_window(raw_df, start_date, end_date)
+    if raw_df.empty:
+        raise core.NoFlightData(f"no flights between {start_date} and {end_date}")
+    timings.append(('fetch', time.perf_counter() - started, f"{len(raw_df):,} flights"))
+    
+    started = time.perf_counter()
+    df, insights = core.process_data(raw_df)
+    routes = len(insights['route_totals']) if insights.get('route_totals') is not None else 0
+    timings.append(('process', time.perf_counter() - started, f"{routes:,} routes"))
+    
+    os.makedirs(output_dir, exist_ok=True)
+    failed = 0
+    for format_type in formats:
+        extension = core.EXPORT_FORMATS[format_type][1]
+        path = os.path.join(output_dir, f"{prefix}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{extension}")
+        started = time.perf_counter()
+        try:
+            size = write_export(df, insights, format_type, path)
+            detail = f"{path} ({size / 1024 / 1024:.1f} MB)"
+        except Exception as e:
+            failed += 1
+            core.logger.error(f"{format_type} export failed: {e}")
+            detail = f"failed: {e}"
+        timings.append((f"export {format_type}", time.perf_counter() - started, detail))
+    
+    return timings, failed
+
+def print_timings(timings: List[Tuple[str, float, str]]) -> None:
+    """
+    Print the stage timings as a table.
+    """
+    print(f"{'stage':<16} {'seconds':>9}  detail")
+    for stage, seconds, detail in timings:
+        print(f"{stage:<16} {seconds:>9.2f}  {detail}")
+    print(f"{'total':<16} {sum(seconds for _, seconds, _ in timings):>9.2f}")
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    """
+    Parse the command line and run one batch.
+    
+    Args:
+        argv: Command-line arguments (defaults to sys.argv[1:])
+        
+    Returns:
+        Exit status: 0 on success, 1 if an export failed, 2 if the window has no real flights
+    """
+    parser = argparse.ArgumentParser(description="Run the airline analysis pipeline without the dashboard")
+    parser.add_argument('--start', type=parse_date, help="first day (YYYY-MM-DD, default: --days before --end)")
+    parser.add_argument('--end', type=parse_date, default=datetime.now().date(), help="last day (YYYY-MM-DD, default: today)")
+    parser.add_argument('--days', type=int, default=30, help="window length when --start is omitted (default: 30)")
+    parser.add_argument('--format', dest='formats', nargs='+', choices=list(core.EXPORT_FORMATS), default=['csv'],
+                        help="export formats to write (default: csv)")
+    parser.add_argument('--output-dir', default='exports', help="directory for the export files (default: ./exports)")
+    parser.add_argument('--prefix', default='airline_analysis', help="file name prefix of the exports")
+    parser.add_argument('--sample', action='store_true', help="use generated sample data instead of the APIs")
+    parser.add_argument('--backfill', action='store_true',
+                        help="store the OpenSky history of the window first (slow: one request per interval)")
+    parser.add_argument('--quiet', action='store_true', help="only log warnings and errors")
+    args = parser.parse_args(argv)
+    
+    start_date = args.start or args.end - timedelta(days=args.days - 1)
+    if start_date > args.end:
+        parser.error("--start must not be after --end")
+    
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s')
+    
+    try:
+        timings, failed = run_batch(start_date, args.end, args.formats, args.output_dir, args.sample, args.prefix,
+                                   args.backfill)
+    except core.NoFlightData as e:
+        core.logger.error(f"Nothing exported: {e}")
+        return 2
+    print_timings(timings)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
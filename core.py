@@ -0,0 +1,2802 @@
+"""
+UI-free core of the Airline Market Demand Analyzer.
+
+Fetching, processing, filtering, insights and report exports live here so
+they can run without Streamlit (see cli.py for the batch entry point).
+Status messages go to the ``core`` logger; the dashboard shows them on the
+page and the CLI prints them.
+"""
+
+import logging
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import json
+from datetime import datetime, timedelta
+import os
+from dotenv import load_dotenv
+import numpy as np
+import time
+import hashlib
+import uuid
+from datetime import date
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+import io
+import gzip
+import tempfile
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.barcharts import HorizontalBarChart
+from reportlab.graphics.charts.lineplots import LinePlot
+from functools import lru_cache
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Set by front ends to hand per-thread state (e.g. the Streamlit page) to
+# provider worker threads: a callable returning a thread initializer
+worker_context_factory: Optional[Callable[[], Optional[Callable[[], None]]]] = None
+
+AVIATIONSTACK_API_KEY = os.getenv('AVIATIONSTACK_API_KEY')
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+# Provider endpoints (overridable, e.g. to point at a local stub server)
+AVIATIONSTACK_URL = os.getenv('AVIATIONSTACK_URL', 'http://api.aviationstack.com/v1/flights')
+OPENSKY_URL = os.getenv('OPENSKY_URL', 'https://opensky-network.org/api/flights/all')
+
+# AviationStack paging: records per page, request budget per fetch and concurrency
+AVIATIONSTACK_PAGE_SIZE = 100  # Free tier limit
+AVIATIONSTACK_MAX_PAGES = int(os.getenv('AVIATIONSTACK_MAX_PAGES', '10'))
+AVIATIONSTACK_CONCURRENCY = 4
+AVIATIONSTACK_REQUESTS_PER_SECOND = float(os.getenv('AVIATIONSTACK_REQUESTS_PER_SECOND', '2'))
+
+# OpenSky limits /flights/all requests to two-hour intervals
+OPENSKY_SLICE_SECONDS = 2 * 60 * 60
+OPENSKY_CONCURRENCY = 2
+
+# Backfills leave this many OpenSky tokens to interactive fetches and are
+# limited to this many days when started from the dashboard
+OPENSKY_BACKFILL_RESERVE = 4
+OPENSKY_BACKFILL_MAX_DAYS = 31
+
+# Backfilled slices are written to the store in batches of this many (one day)
+OPENSKY_BACKFILL_FLUSH_SLICES = 12
+
+# HTTP client settings shared by all providers
+HTTP_TIMEOUT = 10
+HTTP_POOL_SIZE = 10
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_SECONDS = 1.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Longest an interactive fetch waits for a rate-limited request slot (seconds)
+RATE_LIMIT_MAX_WAIT = 15
+
+# Per-provider token buckets: (requests per second, burst size)
+OPENSKY_REQUESTS_PER_MINUTE = float(os.getenv('OPENSKY_REQUESTS_PER_MINUTE', '10'))
+PROVIDER_RATE_LIMITS = {
+    'aviationstack': (AVIATIONSTACK_REQUESTS_PER_SECOND, AVIATIONSTACK_CONCURRENCY),
+    'opensky': (OPENSKY_REQUESTS_PER_MINUTE / 60, OPENSKY_REQUESTS_PER_MINUTE)
+}
+
+# Seconds a fetched/processed dataset stays cached across reruns
+DATA_CACHE_TTL = int(os.getenv('DATA_CACHE_TTL', '900'))
+
+# Shared dataset registry: memory ceiling and how long a session's lease lasts
+DATASET_MEMORY_LIMIT_MB = int(os.getenv('DATASET_MEMORY_LIMIT_MB', '2048'))
+DATASET_LEASE_SECONDS = 3600
+
+# Local flight history store (mounted as ./data in docker-compose.yml)
+DATA_DIR = os.getenv('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+FLIGHT_STORE_DIR = os.path.join(DATA_DIR, 'flights')
+
+# Canonical compact dtypes for the flight DataFrame ('date' is always datetime64)
+FLIGHT_SCHEMA = {
+    'departure_city': 'category',
+    'destination_city': 'category',
+    'airline': 'category',
+    'price': 'float32',
+    'capacity': 'int16',
+    'occupancy': 'int16'
+}
+
+# Largest departure x destination code space mapped with a dense lookup table
+ROUTE_LOOKUP_LIMIT = 1 << 24
+
+# Dimensions and additive measures of the pre-aggregated flight cube
+CUBE_DIMENSIONS = ['date', 'departure_city', 'destination_city', 'airline']
+CUBE_SUM_MEASURES = ['flights', 'price_sum', 'price_sq_sum', 'occupancy_sum', 'capacity_sum',
+                     'occupancy_rate_sum', 'occupancy_rate_sq_sum', 'revenue']
+# Measures whose per-cell min/max let range filters be answered from the cube
+CUBE_RANGE_MEASURES = ['price', 'occupancy_rate']
+
+# Categorical columns with per-value row-id postings for equality filters
+INDEXED_COLUMNS = ['departure_city', 'destination_city', 'airline']
+
+# Rows serialized per chunk by the streaming exporters
+EXPORT_CHUNK_ROWS = 100_000
+
+# Export formats that contain only the flight rows
+DATA_EXPORT_FORMATS = ['csv', 'csv.gz', 'parquet']
+
+# Export formats offered in the UI: (label, file extension, MIME type)
+EXPORT_FORMATS = {
+    'csv': ('CSV', 'csv', 'text/csv'),
+    'csv.gz': ('CSV (gzip)', 'csv.gz', 'application/gzip'),
+    'parquet': ('Parquet', 'parquet', 'application/vnd.apache.parquet'),
+    'excel': ('Excel', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('PDF', 'pdf', 'application/pdf')
+}
+
+# Background export builds: worker threads, finished files kept and the
+# total size of the kept files
+EXPORT_WORKERS = 2
+EXPORT_CACHE_JOBS = 8
+EXPORT_CACHE_MB = int(os.getenv('EXPORT_CACHE_MB', '256'))
+
+# Flight records listed in PDF reports (route summaries are always complete)
+PDF_MAX_FLIGHT_ROWS = 1000
+
+# Row height of PDF data tables in points (7pt text plus padding)
+PDF_TABLE_ROW_HEIGHT = 11
+
+# Data rows per Excel sheet (the format allows 1,048,576 rows including the header)
+EXCEL_MAX_ROWS = 1_048_575
+
+# AI insight generation: provider (see INSIGHT_PROVIDERS), request timeout and on-disk answer cache
+INSIGHT_PROVIDER = os.getenv('INSIGHT_PROVIDER', 'gemini')
+INSIGHT_TIMEOUT_SECONDS = float(os.getenv('INSIGHT_TIMEOUT_SECONDS', '60'))
+INSIGHT_CACHE_DIR = os.path.join(DATA_DIR, 'insights')
+GEMINI_MODEL = 'gemini-pro'
+
+# Columns identifying one flight when the same flight is fetched twice
+FLIGHT_KEY_COLUMNS = ['date', 'flight_number', 'departure_city', 'destination_city']
+
+# Sample data for demonstration when APIs are not available
+SAMPLE_CITIES = [
+    'New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix',
+    'Philadelphia', 'San Antonio', 'San Diego', 'Dallas', 'San Jose',
+    'Miami', 'Atlanta', 'Denver', 'Seattle', 'Portland'
+]
+
+SAMPLE_AIRLINES = ['American Airlines', 'Delta', 'United', 'Southwest', 'JetBlue']
+
+# Popular routes that should always have flights
+POPULAR_ROUTES = [
+    ('New York', 'Los Angeles'),
+    ('New York', 'Chicago'),
+    ('Los Angeles', 'Chicago'),
+    ('Chicago', 'Miami'),
+    ('Denver', 'Seattle'),
+    ('New York', 'Miami'),
+    ('Los Angeles', 'Miami'),
+    ('Atlanta', 'New York'),
+    ('Dallas', 'Los Angeles'),
+    ('Houston', 'Chicago')
+]
+
+def derive_routes(departure: pd.Series, destination: pd.Series) -> pd.Categorical:
+    """
+    Build the route categorical from the departure/destination code pair.
+    
+    Rows are mapped to routes with integer arithmetic on the city codes;
+    a "Departure → Destination" label is formatted once per distinct
+    route, never per flight.
+    
+    Args:
+        departure: Departure city column
+        destination: Destination city column
+        
+    Returns:
+        Categorical of routes aligned with the input rows
+    """
+    departure = departure.astype('category')
+    destination = destination.astype('category')
+    dep_codes = departure.cat.codes.to_numpy().astype(np.int64)
+    dest_codes = destination.cat.codes.to_numpy().astype(np.int64)
+    num_destinations = max(len(destination.cat.categories), 1)
+    
+    valid = (dep_codes >= 0) & (dest_codes >= 0)
+    pair_codes = dep_codes * num_destinations + dest_codes
+    pair_space = len(departure.cat.categories) * num_destinations
+    
+    if pair_space <= ROUTE_LOOKUP_LIMIT:
+        present = np.zeros(pair_space, dtype=bool)
+        present[pair_codes[valid]] = True
+        unique_pairs = np.flatnonzero(present)
+        lookup = np.cumsum(present) - 1
+        valid_route_codes = lookup[pair_codes[valid]]
+    else:
+        unique_pairs, valid_route_codes = np.unique(pair_codes[valid], return_inverse=True)
+    
+    route_codes = np.full(len(pair_codes), -1, dtype=np.int64)
+    route_codes[valid] = valid_route_codes
+    
+    dep_names = departure.cat.categories
+    dest_names = destination.cat.categories
+    labels = [f"{dep_names[pair // num_destinations]} → {dest_names[pair % num_destinations]}" for pair in unique_pairs]
+    return pd.Categorical.from_codes(route_codes, categories=labels)
+
+def enforce_flight_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast a flight DataFrame to the compact schema in FLIGHT_SCHEMA.
+    
+    Cities and airlines become categoricals (so grouping runs on integer
+    codes), counts become int16 and prices float32, and the route column is
+    derived from the city codes. Columns that already have the target dtype
+    are left untouched.
+    
+    Args:
+        df: Flight data DataFrame from any producer
+        
+    Returns:
+        DataFrame with the canonical dtypes
+    """
+    if df is None:
+        return df
+    
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'])
+    
+    for column, dtype in FLIGHT_SCHEMA.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        if dtype.startswith('int') and df[column].isna().any():
+            # Integer dtypes cannot hold missing values; keep them as compact floats
+            df[column] = df[column].astype('float32')
+        else:
+            df[column] = df[column].astype(dtype)
+    
+    if 'departure_city' in df.columns and 'destination_city' in df.columns:
+        if 'route' not in df.columns or not isinstance(df['route'].dtype, pd.CategoricalDtype):
+            df['route'] = derive_routes(df['departure_city'], df['destination_city'])
+    
+    return df
+
+def generate_sample_data(days: int = 30, min_flights: int = 20, max_flights: int = 50,
+                         seed: Optional[int] = 42,
+                         rng: Optional[np.random.Generator] = None) -> pd.DataFrame:
+    """
+    Generate sample airline data for demonstration purposes.
+    
+    All columns are drawn as whole NumPy arrays and the DataFrame is built
+    once, so large windows (365+ days, tens of thousands of flights per day)
+    stay cheap to generate.
+    
+    Args:
+        days: Number of days to generate data for
+        min_flights: Minimum number of flights per day
+        max_flights: Maximum number of flights per day
+        seed: Seed for the random generator (ignored when rng is given)
+        rng: Optional NumPy random Generator to draw from
+        
+    Returns:
+        DataFrame with sample airline data
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    
+    # Generate dates
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    dates = pd.date_range(start=start_date, end=end_date, freq='D')
+    
+    city_index = {city: i for i, city in enumerate(SAMPLE_CITIES)}
+    popular_dep = np.array([city_index[dep] for dep, _ in POPULAR_ROUTES])
+    popular_dest = np.array([city_index[dest] for _, dest in POPULAR_ROUTES])
+    num_popular = len(POPULAR_ROUTES)
+    
+    # Flights per day; popular routes always get at least 1 flight per day
+    flights_per_day = np.maximum(rng.integers(min_flights, max_flights + 1, size=len(dates)), num_popular)
+    total = int(flights_per_day.sum())
+    day_idx = np.repeat(np.arange(len(dates)), flights_per_day)
+    day_start = np.repeat(np.cumsum(flights_per_day) - flights_per_day, flights_per_day)
+    slot = np.arange(total) - day_start
+    is_popular = slot < num_popular
+    
+    # Routes: fixed for the popular slots, random (departure != destination) otherwise
+    dep_idx = rng.integers(0, len(SAMPLE_CITIES), size=total)
+    dest_idx = rng.integers(0, len(SAMPLE_CITIES) - 1, size=total)
+    dest_idx += dest_idx >= dep_idx
+    popular_slot = slot[is_popular]
+    dep_idx[is_popular] = popular_dep[popular_slot]
+    dest_idx[is_popular] = popular_dest[popular_slot]
+    
+    # Random flight details
+    airline_idx = rng.integers(0, len(SAMPLE_AIRLINES), size=total)
+    prefixes = np.array([airline[:2].upper() for airline in SAMPLE_AIRLINES], dtype=object)
+    flight_numbers = prefixes[airline_idx] + rng.integers(100, 9999, size=total).astype(str).astype(object)
+    
+    # Simulate price based on route popularity and date
+    base_price = rng.uniform(200, 800, size=total)
+    # Weekend and holiday premiums
+    weekend = np.asarray(dates.weekday >= 5)[day_idx]
+    base_price[weekend] *= 1.3
+    # Summer months premium
+    summer = np.asarray(dates.month.isin([6, 7, 8]))[day_idx]
+    base_price[summer] *= 1.2
+    price = np.round(base_price + rng.uniform(-50, 100, size=total), 2)
+    
+    # Random capacity and occupancy
+    capacity = rng.integers(100, 300, size=total)
+    occupancy = rng.integers(50, capacity)
+    
+    df = pd.DataFrame({
+        'date': dates[day_idx],
+        'departure_city': pd.Categorical.from_codes(dep_idx, categories=SAMPLE_CITIES),
+        'destination_city': pd.Categorical.from_codes(dest_idx, categories=SAMPLE_CITIES),
+        'airline': pd.Categorical.from_codes(airline_idx, categories=SAMPLE_AIRLINES),
+        'flight_number': flight_numbers,
+        'price': price,
+        'capacity': capacity,
+        'occupancy': occupancy
+    })
+    df = enforce_flight_schema(df)
+    logger.info(f"📊 Generated {len(df)} sample flights for demonstration")
+    return df
+
+class RateLimitExceeded(Exception):
+    """Raised when a provider's request budget cannot be met in time."""
+
+class NoFlightData(Exception):
+    """Raised when no real flights are available and sample data is not allowed."""
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter with adaptive pauses.
+    
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    A provider answering 429/5xx pauses the whole bucket, so every caller
+    sharing it backs off together. Wait times are recorded as metrics.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def acquire(self, max_wait: Optional[float] = None, reserve: int = 0) -> float:
+        """
+        Take one token, blocking until one is available.
+        
+        Args:
+            max_wait: Longest time to block in seconds (None waits indefinitely)
+            reserve: Tokens to leave in the bucket for other callers, so
+                low-priority bulk work cannot starve interactive requests
+            
+        Returns:
+            Seconds spent waiting
+            
+        Raises:
+            RateLimitExceeded: If no token becomes available within max_wait
+        """
+        started = time.monotonic()
+        # A reserve the bucket can never hold would block forever
+        reserve = min(reserve, max(int(self.capacity) - 1, 0))
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1 + reserve:
+                    self.tokens -= 1
+                    waited = now - started
+                    self.requests += 1
+                    self.total_wait += waited
+                    self.max_wait = max(self.max_wait, waited)
+                    return waited
+                delay = max(self.paused_until - now, (1 + reserve - self.tokens) / self.rate)
+            
+            if max_wait is not None and time.monotonic() - started + delay > max_wait:
+                raise RateLimitExceeded(f"request budget exhausted, next slot in {delay:.0f}s")
+            time.sleep(delay)
+    
+    def pause(self, seconds: float) -> None:
+        """
+        Stop handing out tokens for a while after the provider throttled us.
+        
+        Args:
+            seconds: Length of the pause
+        """
+        with self.lock:
+            self.throttled += 1
+            # Let a single request probe the provider once the pause is over
+            self.tokens = min(self.tokens, 1)
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+    
+    def metrics(self) -> Dict[str, float]:
+        """
+        Return request, throttle and wait-time counters.
+        
+        Returns:
+            Dictionary of limiter metrics
+        """
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'total_wait': round(self.total_wait, 2),
+                'avg_wait': round(self.total_wait / self.requests, 2) if self.requests else 0.0,
+                'max_wait': round(self.max_wait, 2)
+            }
+
+@lru_cache(maxsize=None)
+def get_rate_limiter(provider: str) -> TokenBucket:
+    """
+    Return the process-wide rate limiter for a provider.
+    
+    Cached per process, so all dashboard sessions and batch runs in this
+    process share one request budget per provider.
+    
+    Args:
+        provider: Key of PROVIDER_RATE_LIMITS
+        
+    Returns:
+        TokenBucket for the provider
+    """
+    rate, capacity = PROVIDER_RATE_LIMITS[provider]
+    return TokenBucket(rate, capacity)
+
+@lru_cache(maxsize=1)
+def get_http_session() -> requests.Session:
+    """
+    Return the pooled HTTP session shared by all providers.
+    
+    The session is cached per process, so keep-alive connections are
+    reused across reruns and sessions.
+    
+    Returns:
+        requests.Session with a pooled adapter for http and https
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_with_retry(session: requests.Session, url: str, params: Dict, provider: str,
+                   max_wait: Optional[float] = RATE_LIMIT_MAX_WAIT, reserve: int = 0) -> requests.Response:
+    """
+    GET a URL through the provider's rate limiter, retrying failures with exponential backoff.
+    
+    429/5xx responses pause the provider's shared token bucket (honouring
+    Retry-After when given), so concurrent callers back off together.
+    
+    Args:
+        session: HTTP session to use
+        url: Endpoint URL
+        params: Query parameters
+        provider: Key of PROVIDER_RATE_LIMITS
+        max_wait: Longest time to wait for a request slot (None waits indefinitely)
+        reserve: Request slots to leave to other callers (see TokenBucket.acquire)
+        
+    Returns:
+        The final response (which may still carry a retryable status)
+        
+    Raises:
+        RateLimitExceeded: If the provider's request budget is exhausted for longer than max_wait
+    """
+    limiter = get_rate_limiter(provider)
+    
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        limiter.acquire(max_wait, reserve)
+        backoff = HTTP_BACKOFF_SECONDS * 2 ** attempt
+        try:
+            response = session.get(url, params=params, timeout=HTTP_TIMEOUT)
+        except requests.RequestException:
+            if attempt == HTTP_MAX_RETRIES:
+                raise
+            time.sleep(backoff)
+            continue
+        
+        if response.status_code not in RETRYABLE_STATUS_CODES or attempt == HTTP_MAX_RETRIES:
+            return response
+        
+        retry_after = response.headers.get('Retry-After', '')
+        limiter.pause(float(retry_after) if retry_after.isdigit() else backoff)
+
+def aviationstack_page_to_frame(records: List[Dict]) -> pd.DataFrame:
+    """
+    Convert one page of AviationStack records into a flight DataFrame.
+    
+    Columns are built directly from the page instead of going through a
+    list of per-flight dicts.
+    
+    Args:
+        records: The 'data' list of an AviationStack /flights response
+        
+    Returns:
+        DataFrame with one row per flight that has departure and arrival info
+    """
+    records = [flight for flight in records if flight.get('departure') and flight.get('arrival')]
+    num_flights = len(records)
+    today = datetime.now().date().isoformat()
+    rng = np.random.default_rng()
+    
+    return pd.DataFrame({
+        'date': pd.to_datetime([flight.get('flight_date') or today for flight in records]),
+        'departure_city': [flight['departure'].get('airport') or 'Unknown' for flight in records],
+        'destination_city': [flight['arrival'].get('airport') or 'Unknown' for flight in records],
+        'airline': [(flight.get('airline') or {}).get('name') or 'Unknown' for flight in records],
+        'flight_number': [(flight.get('flight') or {}).get('iata') or 'Unknown' for flight in records],
+        'price': rng.uniform(200, 800, size=num_flights),  # Simulated price
+        'capacity': rng.integers(100, 300, size=num_flights),
+        'occupancy': rng.integers(50, 300, size=num_flights)
+    })
+
+def fetch_aviationstack_page(session: requests.Session, offset: int) -> Tuple[Optional[pd.DataFrame], Dict]:
+    """
+    Fetch a single AviationStack /flights page.
+    
+    Args:
+        session: HTTP session to use
+        offset: Offset of the first record on the page
+        
+    Raises:
+        RateLimitExceeded: If the AviationStack request budget is exhausted
+        
+    Returns:
+        Tuple of (page DataFrame or None on a failed request, pagination info)
+    """
+    params = {
+        'access_key': AVIATIONSTACK_API_KEY,
+        'limit': AVIATIONSTACK_PAGE_SIZE,
+        'offset': offset
+    }
+    response = get_with_retry(session, AVIATIONSTACK_URL, params, provider='aviationstack')
+    
+    if response.status_code != 200:
+        return None, {}
+    
+    data = response.json()
+    return aviationstack_page_to_frame(data.get('data') or []), data.get('pagination') or {}
+
+def fetch_aviationstack_data(session: Optional[requests.Session] = None, start_date: Optional[date] = None,
+                             end_date: Optional[date] = None) -> Optional[pd.DataFrame]:
+    """
+    Fetch data from AviationStack API, walking result pages concurrently.
+    
+    The first page reports the total number of records; the remaining
+    offsets are fetched AVIATIONSTACK_CONCURRENCY at a time through the
+    shared AviationStack rate limiter, capped at AVIATIONSTACK_MAX_PAGES.
+    Paging stops early once a page holds only flights older than start_date,
+    or when a later page fails; the pages fetched before the failure are kept.
+    
+    Args:
+        session: HTTP session to use (defaults to the shared pooled session)
+        start_date: First day of the requested window
+        end_date: Last day of the requested window
+        
+    Returns:
+        DataFrame with flight data or None if API is not available
+    """
+    if not AVIATIONSTACK_API_KEY:
+        return None
+    
+    def before_window(page: pd.DataFrame) -> bool:
+        return start_date is not None and not page.empty and page['date'].max() < pd.Timestamp(start_date)
+    
+    try:
+        session = session or get_http_session()
+        first_page, pagination = fetch_aviationstack_page(session, 0)
+        
+        if first_page is None:
+            return None
+        
+        pages = [first_page]
+        total = int(pagination.get('total', len(first_page)))
+        offsets = list(range(AVIATIONSTACK_PAGE_SIZE, total, AVIATIONSTACK_PAGE_SIZE))[:max(AVIATIONSTACK_MAX_PAGES - 1, 0)]
+        window_covered = before_window(first_page)
+        
+        with ThreadPoolExecutor(max_workers=AVIATIONSTACK_CONCURRENCY) as executor:
+            for batch_start in range(0, len(offsets), AVIATIONSTACK_CONCURRENCY):
+                if window_covered:
+                    break
+                
+                batch = offsets[batch_start:batch_start + AVIATIONSTACK_CONCURRENCY]
+                futures = [executor.submit(fetch_aviationstack_page, session, offset) for offset in batch]
+                for offset, future in zip(batch, futures):
+                    try:
+                        page, _ = future.result()
+                    except RateLimitExceeded as e:
+                        # Keep the pages fetched so far and stop paging
+                        logger.warning(f"⏳ AviationStack rate limit reached at offset {offset} ({e}); "
+                                       f"keeping {len(pages)} fetched pages")
+                        window_covered = True
+                        continue
+                    except Exception as e:
+                        logger.warning(f"AviationStack page at offset {offset} failed ({e}); "
+                                       f"keeping {len(pages)} fetched pages")
+                        window_covered = True
+                        continue
+                    if page is None or before_window(page):
+                        window_covered = True
+                    if page is not None:
+                        pages.append(page)
+        
+        df = pd.concat(pages, ignore_index=True)
+        if df.empty:
+            return None
+        
+        df = enforce_flight_schema(df)
+        append_to_flight_store(df, source="aviationstack")
+        return df
+        
+    except RateLimitExceeded as e:
+        logger.warning(f"⏳ AviationStack rate limit reached ({e}); falling back to stored or sample data")
+        return None
+    except Exception as e:
+        logger.warning(f"AviationStack API error: {e}")
+        return None
+
+def opensky_records_to_frame(records: List[Dict]) -> pd.DataFrame:
+    """
+    Convert OpenSky /flights/all records into a flight DataFrame.
+    
+    The JSON records are loaded into columns once and all conversions
+    (timestamps, callsigns) run as vectorized column operations.
+    
+    Args:
+        records: Decoded JSON list returned by /flights/all
+        
+    Returns:
+        DataFrame with one row per flight that has departure and arrival airports
+    """
+    raw = pd.DataFrame.from_records(records, columns=['firstSeen', 'estDepartureAirport', 'estArrivalAirport', 'callsign'])
+    raw = raw.dropna(subset=['estDepartureAirport', 'estArrivalAirport'])
+    num_flights = len(raw)
+    callsign = raw['callsign'].fillna('Unknown').astype(str).str.strip()
+    first_seen = raw['firstSeen'].fillna(time.time())
+    rng = np.random.default_rng()
+    
+    return pd.DataFrame({
+        'date': pd.to_datetime(first_seen, unit='s').dt.normalize().to_numpy(),
+        'departure_city': raw['estDepartureAirport'].to_numpy(),
+        'destination_city': raw['estArrivalAirport'].to_numpy(),
+        'airline': callsign.str[:3].to_numpy(),
+        'flight_number': callsign.to_numpy(),
+        'price': rng.uniform(200, 800, size=num_flights),  # Simulated price
+        'capacity': rng.integers(100, 300, size=num_flights),
+        'occupancy': rng.integers(50, 300, size=num_flights)
+    })
+
+def opensky_time_slices(start_date: date, end_date: date) -> List[Tuple[int, int]]:
+    """
+    Split a date range into (begin, end) Unix-time slices OpenSky accepts.
+    
+    Args:
+        start_date: First day of the range
+        end_date: Last day of the range (inclusive)
+        
+    Returns:
+        List of (begin, end) timestamps, each at most OPENSKY_SLICE_SECONDS long
+    """
+    range_start = int(pd.Timestamp(start_date).timestamp())
+    range_end = min(int(pd.Timestamp(end_date + timedelta(days=1)).timestamp()), int(time.time()))
+    return [(begin, min(begin + OPENSKY_SLICE_SECONDS, range_end))
+            for begin in range(range_start, range_end, OPENSKY_SLICE_SECONDS)]
+
+def fetch_opensky_slice(session: requests.Session, begin: int, end: int,
+                        max_wait: Optional[float] = RATE_LIMIT_MAX_WAIT, reserve: int = 0) -> Optional[pd.DataFrame]:
+    """
+    Fetch all flights of one OpenSky time slice.
+    
+    Args:
+        session: HTTP session to use
+        begin: Slice start (Unix time)
+        end: Slice end (Unix time)
+        max_wait: Longest time to wait for a request slot (None waits indefinitely)
+        reserve: Request slots to leave to other callers (see TokenBucket.acquire)
+        
+    Returns:
+        DataFrame with the slice's flights (empty if OpenSky has none), or None on failure
+        
+    Raises:
+        RateLimitExceeded: If the OpenSky request budget is exhausted for longer than max_wait
+    """
+    response = get_with_retry(session, OPENSKY_URL, {'begin': begin, 'end': end}, provider='opensky',
+                              max_wait=max_wait, reserve=reserve)
+    
+    # OpenSky answers 404 when no flights were found in the interval
+    if response.status_code == 404:
+        return opensky_records_to_frame([])
+    if response.status_code != 200:
+        return None
+    return opensky_records_to_frame(response.json() or [])
+
+def fetch_opensky_data(session: Optional[requests.Session] = None, start_date: Optional[date] = None,
+                       end_date: Optional[date] = None) -> Optional[pd.DataFrame]:
+    """
+    Fetch data from OpenSky Network API.
+    
+    Only the most recent slice (OPENSKY_SLICE_SECONDS) is requested; use
+    backfill_opensky_data for longer ranges. The date window is accepted so
+    all providers share one signature.
+    
+    Args:
+        session: HTTP session to use (defaults to the shared pooled session)
+        start_date: First day of the requested window
+        end_date: Last day of the requested window
+        
+    Returns:
+        DataFrame with flight data or None if API is not available
+    """
+    try:
+        # OpenSky Network API (no API key required for basic usage)
+        end_time = int(time.time())
+        start_time = end_time - OPENSKY_SLICE_SECONDS
+        
+        df = fetch_opensky_slice(session or get_http_session(), start_time, end_time)
+        
+        if df is not None and not df.empty:
+            df = enforce_flight_schema(df)
+            append_to_flight_store(df, source="opensky")
+            return df
+        
+        return None
+        
+    except RateLimitExceeded as e:
+        logger.warning(f"⏳ OpenSky rate limit reached ({e}); falling back to stored or sample data")
+        return None
+    except Exception as e:
+        logger.warning(f"OpenSky API error: {e}")
+        return None
+
+def backfill_duration(start_date: date, end_date: date) -> Tuple[int, float]:
+    """
+    Estimate the size of an OpenSky backfill.
+    
+    Args:
+        start_date: First day to backfill
+        end_date: Last day to backfill (inclusive)
+        
+    Returns:
+        Tuple of (number of time slices, seconds the OpenSky request budget needs for them)
+    """
+    slices = len(opensky_time_slices(start_date, end_date))
+    rate, _ = PROVIDER_RATE_LIMITS['opensky']
+    return slices, slices / rate
+
+def backfill_opensky_data(start_date: date, end_date: date,
+                          session: Optional[requests.Session] = None,
+                          progress: Optional[Callable[[float], None]] = None) -> Optional[pd.DataFrame]:
+    """
+    Backfill the local store with OpenSky flights for an arbitrary date range.
+    
+    The range is split into OPENSKY_SLICE_SECONDS slices which are fetched
+    OPENSKY_CONCURRENCY at a time, each with retry and backoff. Slices wait
+    for the shared OpenSky rate limiter instead of failing when the budget
+    is used up, so long ranges take minutes rather than burning the quota.
+    They leave OPENSKY_BACKFILL_RESERVE request slots to interactive
+    fetches, which therefore keep working while a backfill runs.
+    Completed slices are stored every OPENSKY_BACKFILL_FLUSH_SLICES slices;
+    a slice that still fails after its retries is counted and skipped.
+    
+    Args:
+        start_date: First day to backfill
+        end_date: Last day to backfill (inclusive)
+        session: HTTP session to use (defaults to the shared pooled session)
+        progress: Optional callback receiving the fraction of slices fetched (0-1)
+        
+    Returns:
+        DataFrame with all fetched flights, or None if nothing was fetched
+    """
+    session = session or get_http_session()
+    slices = opensky_time_slices(start_date, end_date)
+    frames, pending = [], []
+    failed = 0
+    
+    def flush() -> None:
+        # Store completed slices as they arrive so an interrupted backfill keeps them
+        if pending:
+            append_to_flight_store(enforce_flight_schema(pd.concat(pending, ignore_index=True)), source="opensky")
+            frames.extend(pending)
+            pending.clear()
+    
+    with ThreadPoolExecutor(max_workers=OPENSKY_CONCURRENCY) as executor:
+        futures = [executor.submit(fetch_opensky_slice, session, *time_slice, max_wait=None,
+                                   reserve=OPENSKY_BACKFILL_RESERVE) for time_slice in slices]
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                frame = future.result()
+            except Exception as e:
+                logger.warning(f"OpenSky backfill slice failed: {e}")
+                frame = None
+            if frame is None:
+                failed += 1
+            elif not frame.empty:
+                pending.append(frame)
+                if len(pending) >= OPENSKY_BACKFILL_FLUSH_SLICES:
+                    flush()
+            if progress is not None:
+                progress(done / len(futures))
+    flush()
+    
+    if failed:
+        logger.warning(f"OpenSky backfill: {failed} of {len(slices)} time slices could not be fetched")
+    
+    if not frames:
+        return None
+    return enforce_flight_schema(pd.concat(frames, ignore_index=True))
+
+def append_to_flight_store(df: pd.DataFrame, source: str) -> int:
+    """
+    Append fetched flights to the local Parquet store, one partition per date.
+    
+    Each call writes new files into date=YYYY-MM-DD partitions, so earlier
+    fetches are never rewritten.
+    
+    Args:
+        df: Flight data to persist
+        source: Name of the API the flights came from (used in file names)
+        
+    Returns:
+        Number of rows written
+    """
+    if df is None or df.empty or 'date' not in df.columns:
+        return 0
+    
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        
+        # Routes are derived from the city columns on read
+        to_write = df.drop(columns=['route'], errors='ignore')
+        to_write['date'] = pd.to_datetime(to_write['date']).dt.date
+        # Plain strings keep the file schema independent of each frame's
+        # category count (dictionary index widths would differ per file)
+        for column in to_write.select_dtypes('category').columns:
+            to_write[column] = to_write[column].astype(object)
+        table = pa.Table.from_pandas(to_write, preserve_index=False)
+        
+        os.makedirs(FLIGHT_STORE_DIR, exist_ok=True)
+        ds.write_dataset(
+            table,
+            FLIGHT_STORE_DIR,
+            format='parquet',
+            partitioning=ds.partitioning(pa.schema([('date', pa.date32())]), flavor='hive'),
+            basename_template=f"{source}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        return len(to_write)
+    except ImportError:
+        return 0
+    except Exception as e:
+        logger.warning(f"Unable to save flights to local store: {e}")
+        return 0
+
+def read_flight_store(start_date: Optional[date] = None, end_date: Optional[date] = None) -> Optional[pd.DataFrame]:
+    """
+    Read stored flights for a date window from the local Parquet store.
+    
+    The date bounds are pushed down to the partition filter, so only the
+    partitions inside the window are opened.
+    
+    Args:
+        start_date: First day to read (inclusive), or None for no lower bound
+        end_date: Last day to read (inclusive), or None for no upper bound
+        
+    Returns:
+        DataFrame with stored flights or None if the store is empty or unavailable
+    """
+    if not os.path.isdir(FLIGHT_STORE_DIR):
+        return None
+    
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        
+        partitioning = ds.partitioning(pa.schema([('date', pa.date32())]), flavor='hive')
+        dataset = ds.dataset(FLIGHT_STORE_DIR, format='parquet', partitioning=partitioning)
+        # Files written with categorical columns may use different dictionary
+        # index widths; read every dictionary column as plain strings
+        schema = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_dictionary(field.type) else field
+                            for field in dataset.schema])
+        if not schema.equals(dataset.schema):
+            dataset = ds.dataset(FLIGHT_STORE_DIR, format='parquet', partitioning=partitioning, schema=schema)
+        predicate = None
+        if start_date is not None:
+            predicate = ds.field('date') >= pa.scalar(start_date, pa.date32())
+        if end_date is not None:
+            upper = ds.field('date') <= pa.scalar(end_date, pa.date32())
+            predicate = upper if predicate is None else predicate & upper
+        
+        df = dataset.to_table(filter=predicate).to_pandas()
+        if df.empty:
+            return None
+        
+        df['date'] = pd.to_datetime(df['date'])
+        df = df[['date'] + [col for col in df.columns if col != 'date']]
+        # Re-fetched flights keep their most recent copy
+        key_columns = [col for col in FLIGHT_KEY_COLUMNS if col in df.columns]
+        df = df.drop_duplicates(subset=key_columns, keep='last').reset_index(drop=True)
+        return enforce_flight_schema(df)
+    except ImportError:
+        return None
+    except Exception as e:
+        logger.warning(f"Unable to read local flight store: {e}")
+        return None
+
+# Flight data providers queried concurrently by fetch_all_providers
+DATA_PROVIDERS = {
+    'AviationStack API': fetch_aviationstack_data,
+    'OpenSky Network API': fetch_opensky_data
+}
+
+def fetch_all_providers(providers: Optional[Dict] = None, start_date: Optional[date] = None,
+                        end_date: Optional[date] = None) -> Dict[str, Optional[pd.DataFrame]]:
+    """
+    Query all data providers concurrently over the shared HTTP session.
+    
+    Args:
+        providers: Mapping of provider name to fetch function (defaults to DATA_PROVIDERS)
+        start_date: First day of the requested window
+        end_date: Last day of the requested window
+        
+    Returns:
+        Mapping of provider name to its DataFrame (or None if it returned nothing)
+    """
+    providers = providers or DATA_PROVIDERS
+    session = get_http_session()
+    
+    # Let worker threads report into the caller's context (e.g. the current page)
+    initializer = worker_context_factory() if worker_context_factory is not None else None
+    
+    with ThreadPoolExecutor(max_workers=len(providers), initializer=initializer) as executor:
+        futures = {name: executor.submit(fetch, session, start_date, end_date) for name, fetch in providers.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def merge_provider_data(results: Dict[str, Optional[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+    """
+    Merge the DataFrames returned by several providers into one.
+    
+    Args:
+        results: Mapping of provider name to DataFrame (or None)
+        
+    Returns:
+        Combined DataFrame with the canonical schema, or None if no provider returned flights
+    """
+    frames = [df for df in results.values() if df is not None and not df.empty]
+    if not frames:
+        return None
+    # Categories differ between providers, so the route is re-derived after concatenation
+    merged = pd.concat([df.drop(columns=['route'], errors='ignore') for df in frames], ignore_index=True)
+    return enforce_flight_schema(merged)
+
+def fetch_flight_data(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                      allow_sample: bool = True) -> pd.DataFrame:
+    """
+    Fetch flight data from available APIs or generate sample data.
+    
+    Args:
+        start_date: First day of the requested window (sample data covers
+            at least 30 days back from today)
+        end_date: Last day of the requested window
+        allow_sample: Fall back to generated sample data when neither the
+            APIs nor the local store have flights
+        
+    Returns:
+        DataFrame with flight data
+        
+    Raises:
+        NoFlightData: If there are no real flights and allow_sample is False
+    """
+    # Query all APIs concurrently and merge what they return
+    results = fetch_all_providers(start_date=start_date, end_date=end_date)
+    df = merge_provider_data(results)
+    
+    if df is not None:
+        sources = [name for name, result in results.items() if result is not None and not result.empty]
+        logger.info(f"✅ Data fetched from {', '.join(sources)}", extra={'status': 'success'})
+        stored_df = read_flight_store(start_date, end_date)
+        return stored_df if stored_df is not None else df
+    
+    # Fall back to previously stored flights for the window
+    stored_df = read_flight_store(start_date, end_date)
+    
+    if stored_df is not None:
+        logger.info(f"💾 APIs unavailable, using {len(stored_df)} stored flights from {FLIGHT_STORE_DIR}")
+        return stored_df
+    
+    if not allow_sample:
+        raise NoFlightData(f"no flights from the APIs or the local store ({FLIGHT_STORE_DIR})")
+    
+    # Generate sample data if no APIs available
+    logger.info("📊 Using sample data for demonstration (no API keys configured)")
+    days = 30
+    if start_date is not None:
+        days = max(days, (datetime.now().date() - start_date).days)
+    sample_df = generate_sample_data(days)
+    sample_df.attrs['source'] = 'sample'
+    logger.info(f"✅ Sample data generated successfully: {len(sample_df)} flights", extra={'status': 'success'})
+    return sample_df
+
+def get_data_source() -> str:
+    """
+    Return the name of the primary data source for the current configuration.
+    
+    Returns:
+        Data source identifier
+    """
+    return "aviationstack" if AVIATIONSTACK_API_KEY else "opensky"
+
+def api_config_fingerprint() -> str:
+    """
+    Hash the API configuration so cache keys change when keys change,
+    without the keys themselves appearing in the cache.
+    
+    Returns:
+        Short hex digest of the API configuration
+    """
+    config = f"aviationstack={AVIATIONSTACK_API_KEY or ''}"
+    return hashlib.sha256(config.encode('utf-8')).hexdigest()[:16]
+
+def dataset_nbytes(dataset: Tuple[pd.DataFrame, Dict]) -> int:
+    """
+    Estimate the memory held by a processed dataset.
+    
+    Counts the flight frame and everything process_data derives from it
+    that is as large: the cube, the route and daily totals and the
+    filter index arrays.
+    
+    Args:
+        dataset: Tuple of (processed DataFrame, insights dictionary)
+        
+    Returns:
+        Size in bytes
+    """
+    def size(value) -> int:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return int(np.asarray(value.memory_usage(deep=True)).sum())
+        if isinstance(value, np.ndarray):
+            return int(value.nbytes)
+        if isinstance(value, dict):
+            return sum(size(item) for item in value.values())
+        if isinstance(value, (tuple, list)):
+            return sum(size(item) for item in value)
+        return 0
+    
+    processed_df, insights = dataset
+    return size(processed_df) + size(insights)
+
+class DatasetRegistry:
+    """
+    Process-wide registry of immutable datasets shared by all sessions.
+    
+    Entries expire after a TTL and are evicted least-recently-used first
+    once their total size exceeds the memory ceiling, preferring datasets
+    no session is viewing. Each session holds a lease on the dataset it
+    views; leases not renewed within lease_seconds stop counting as
+    references, so closed browser tabs do not pin memory.
+    """
+    
+    def __init__(self, memory_limit: int, ttl: float, lease_seconds: float):
+        self.memory_limit = memory_limit
+        self.ttl = ttl
+        self.lease_seconds = lease_seconds
+        self.entries = OrderedDict()
+        self.leases = {}
+        self.leases_pruned = time.monotonic()
+        self.key_locks = {}
+        self.lock = threading.Lock()
+    
+    def get_or_create(self, key: Tuple, factory: Callable[[], Tuple[object, int]],
+                      session_id: Optional[str] = None,
+                      refresh: Optional[Callable[[object], Optional[Tuple[object, int]]]] = None) -> object:
+        """
+        Return the dataset for a key, building it once if it is missing.
+        
+        Concurrent sessions asking for the same missing key wait for a
+        single build instead of each running the factory. When the entry
+        has only expired, refresh gets the stale dataset first and may
+        update it incrementally; factory runs if it returns None.
+        
+        Args:
+            key: Dataset key
+            factory: Callable returning (dataset, size in bytes)
+            session_id: Session taking a lease on the dataset
+            refresh: Callable turning the stale dataset into (dataset, size in bytes), or None
+            
+        Returns:
+            The shared dataset
+        """
+        with self.lock:
+            value = self._lookup(key, session_id)
+            if value is not None:
+                return value
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        
+        with key_lock:
+            with self.lock:
+                value = self._lookup(key, session_id)
+                if value is not None:
+                    return value
+                stale = self.entries.get(key)
+            
+            built = refresh(stale['value']) if stale is not None and refresh is not None else None
+            value, nbytes = built if built is not None else factory()
+            
+            with self.lock:
+                self.entries[key] = {'value': value, 'nbytes': nbytes, 'created': time.monotonic()}
+                self._lease(key, session_id)
+                self._evict(keep=key)
+                self.key_locks.pop(key, None)
+            return value
+    
+    def refcount(self, key: Tuple) -> int:
+        """
+        Count the sessions currently holding a lease on a dataset.
+        
+        Args:
+            key: Dataset key
+            
+        Returns:
+            Number of live leases
+        """
+        now = time.monotonic()
+        return sum(1 for leased_key, seen in self.leases.values()
+                   if leased_key == key and now - seen <= self.lease_seconds)
+    
+    def clear(self) -> None:
+        """
+        Drop every dataset (sessions rebuild on their next rerun).
+        """
+        with self.lock:
+            self.entries.clear()
+            self.leases.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Return registry size counters.
+        
+        Returns:
+            Dictionary with datasets, bytes and active sessions
+        """
+        with self.lock:
+            now = time.monotonic()
+            return {
+                'datasets': len(self.entries),
+                'bytes': sum(entry['nbytes'] for entry in self.entries.values()),
+                'sessions': sum(1 for _, seen in self.leases.values() if now - seen <= self.lease_seconds)
+            }
+    
+    def _lookup(self, key: Tuple, session_id: Optional[str]) -> Optional[object]:
+        entry = self.entries.get(key)
+        # Expired entries stay until replaced so they can be refreshed incrementally
+        if entry is None or time.monotonic() - entry['created'] > self.ttl:
+            return None
+        self.entries.move_to_end(key)
+        self._lease(key, session_id)
+        return entry['value']
+    
+    def _lease(self, key: Tuple, session_id: Optional[str]) -> None:
+        if session_id is not None:
+            self.leases[session_id] = (key, time.monotonic())
+        self._prune_leases()
+    
+    def _prune_leases(self, force: bool = False) -> None:
+        # Forget sessions that stopped renewing their lease (at most once per lease period)
+        now = time.monotonic()
+        if not force and now - self.leases_pruned < self.lease_seconds:
+            return
+        self.leases_pruned = now
+        for session_id in [session_id for session_id, (_, seen) in self.leases.items()
+                           if now - seen > self.lease_seconds]:
+            del self.leases[session_id]
+    
+    def _evict(self, keep: Tuple) -> None:
+        self._prune_leases(force=True)
+        total = sum(entry['nbytes'] for entry in self.entries.values())
+        while total > self.memory_limit:
+            candidates = [key for key in self.entries if key != keep]
+            if not candidates:
+                break
+            unreferenced = [key for key in candidates if self.refcount(key) == 0]
+            victim = (unreferenced or candidates)[0]
+            total -= self.entries.pop(victim)['nbytes']
+
+def refresh_dataset(dataset: Tuple[pd.DataFrame, Dict], start_date: date,
+                    end_date: date) -> Optional[Tuple[pd.DataFrame, Dict]]:
+    """
+    Refresh an expired dataset by folding in only newly fetched flights.
+    
+    The providers are queried as usual; flights inside the window that the
+    dataset does not already hold are appended with update_dataset.
+    
+    Args:
+        dataset: Stale (processed DataFrame, insights) pair
+        start_date: First day of the window
+        end_date: Last day of the window
+        
+    Returns:
+        Updated (processed DataFrame, insights) pair, or None when the
+        dataset has to be rebuilt from scratch (e.g. it was sample data)
+    """
+    processed_df, insights = dataset
+    if processed_df.attrs.get('source') == 'sample' or 'cube' not in insights:
+        return None
+    
+    new_df = merge_provider_data(fetch_all_providers(start_date=start_date, end_date=end_date))
+    if new_df is None:
+        return dataset
+    
+    dates = new_df['date'].to_numpy()
+    in_window = (dates >= np.datetime64(pd.Timestamp(start_date))) & (dates < np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1)))
+    new_df = new_df[in_window].drop_duplicates(subset=FLIGHT_KEY_COLUMNS, keep='last')
+    
+    # Drop flights the dataset already holds (only rows of the same dates are compared)
+    existing = processed_df.loc[processed_df['date'].isin(new_df['date'].unique()), FLIGHT_KEY_COLUMNS]
+    existing_keys = pd.MultiIndex.from_frame(existing.astype(str))
+    new_keys = pd.MultiIndex.from_frame(new_df[FLIGHT_KEY_COLUMNS].astype(str))
+    new_df = new_df[~new_keys.isin(existing_keys)]
+    
+    if new_df.empty:
+        return dataset
+    return update_dataset(processed_df, insights, new_df)
+
+def process_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Process the flight data to extract insights.
+    
+    Args:
+        df: Raw flight data DataFrame
+        
+    Returns:
+        Tuple of (processed DataFrame, insights dictionary)
+    """
+    processed_df = sort_by_date(derive_flight_metrics(df.copy()))
+    
+    # Extract insights from the aggregate cube instead of rescanning flights
+    insights = insights_from_cube(build_flight_cube(processed_df))
+    insights['index'] = build_flight_index(processed_df)
+    insights['dataset_id'] = uuid.uuid4().hex
+    
+    return processed_df, insights
+
+def sort_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return the flights in date order so date ranges are contiguous row slices.
+    
+    Args:
+        df: Processed flight data DataFrame
+        
+    Returns:
+        The same DataFrame if already sorted, otherwise a stably sorted copy
+        with a fresh RangeIndex
+    """
+    if 'date' not in df.columns or df['date'].is_monotonic_increasing:
+        return df
+    sorted_df = df.sort_values('date', kind='stable', ignore_index=True)
+    sorted_df.attrs = dict(df.attrs)
+    return sorted_df
+
+def build_flight_index(df: pd.DataFrame) -> Dict:
+    """
+    Build the row index the filter engine uses to avoid full scans.
+    
+    Every categorical column in INDEXED_COLUMNS gets its row positions
+    grouped by category code (a stable argsort, so positions stay ascending
+    within a value) plus an offsets table: rows with code c are
+    order[offsets[c]:offsets[c + 1]]. Date ranges need no postings when the
+    frame is date-sorted; they become binary searches over the dates.
+    
+    Args:
+        df: Processed flight data DataFrame
+        
+    Returns:
+        Index dictionary with rows, date_sorted and postings
+        ({column: (order, offsets)})
+    """
+    position_dtype = np.int32 if len(df) < np.iinfo(np.int32).max else np.int64
+    index = {
+        'rows': len(df),
+        'date_sorted': 'date' in df.columns and pd.api.types.is_datetime64_any_dtype(df['date']) and df['date'].is_monotonic_increasing,
+        'postings': {}
+    }
+    
+    for column in INDEXED_COLUMNS:
+        if column not in df.columns or not isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        codes = df[column].cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable').astype(position_dtype, copy=False)
+        # Missing values (code -1) sort first and are skipped by the offsets
+        counts = np.bincount(codes[codes >= 0], minlength=len(df[column].cat.categories))
+        offsets = np.concatenate([[0], np.cumsum(counts)]) + int((codes < 0).sum())
+        index['postings'][column] = (order, offsets)
+    
+    return index
+
+def derive_flight_metrics(processed_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the occupancy_rate and revenue columns to a flight DataFrame.
+    
+    Args:
+        processed_df: Flight data DataFrame (modified in place)
+        
+    Returns:
+        The same DataFrame with the derived columns
+    """
+    # Convert date to datetime if it's not already
+    if 'date' in processed_df.columns:
+        processed_df['date'] = pd.to_datetime(processed_df['date'])
+    
+    # Calculate additional metrics if required columns exist
+    if 'occupancy' in processed_df.columns and 'capacity' in processed_df.columns:
+        processed_df['occupancy_rate'] = (processed_df['occupancy'] / processed_df['capacity'] * 100).round(2).astype('float32')
+    else:
+        processed_df['occupancy_rate'] = 0
+    
+    if 'price' in processed_df.columns and 'occupancy' in processed_df.columns:
+        # Revenue totals need more precision than float32 prices carry
+        processed_df['revenue'] = processed_df['price'].astype('float64') * processed_df['occupancy']
+    else:
+        processed_df['revenue'] = 0
+    
+    return processed_df
+
+def build_flight_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Materialize the flight aggregate cube.
+    
+    One row per (date, departure_city, destination_city, airline) cell
+    holding additive measures, so KPIs, charts and summary tables can be
+    answered by re-aggregating cells instead of scanning flights.
+    
+    Args:
+        df: Processed flight data DataFrame
+        
+    Returns:
+        Cube DataFrame with the CUBE_DIMENSIONS, a derived route column and
+        the measures flights, price_sum, price_sq_sum, price_min, price_max,
+        occupancy_sum, capacity_sum, occupancy_rate_sum,
+        occupancy_rate_sq_sum, occupancy_rate_min, occupancy_rate_max and
+        revenue
+    """
+    dimensions = [column for column in CUBE_DIMENSIONS if column in df.columns]
+    work = pd.DataFrame({column: df[column] for column in dimensions})
+    
+    # Sums are accumulated in float64 whatever the stored dtypes are
+    for column in ['price', 'occupancy', 'capacity', 'occupancy_rate', 'revenue']:
+        work[column] = df[column].astype('float64') if column in df.columns else np.nan
+    work['price_sq'] = work['price'] ** 2
+    work['occupancy_rate_sq'] = work['occupancy_rate'] ** 2
+    
+    aggregations = {
+        'flights': ('price', 'size'),
+        'price_sum': ('price', 'sum'),
+        'price_sq_sum': ('price_sq', 'sum'),
+        'price_min': ('price', 'min'),
+        'price_max': ('price', 'max'),
+        'occupancy_sum': ('occupancy', 'sum'),
+        'capacity_sum': ('capacity', 'sum'),
+        'occupancy_rate_sum': ('occupancy_rate', 'sum'),
+        'occupancy_rate_sq_sum': ('occupancy_rate_sq', 'sum'),
+        'occupancy_rate_min': ('occupancy_rate', 'min'),
+        'occupancy_rate_max': ('occupancy_rate', 'max'),
+        'revenue': ('revenue', 'sum')
+    }
+    
+    if dimensions:
+        cube = work.groupby(dimensions, observed=True, dropna=False, sort=True).agg(**aggregations).reset_index()
+    else:
+        cube = work.agg(**aggregations).T.reset_index(drop=True) if not work.empty else pd.DataFrame(columns=list(aggregations))
+    
+    if 'departure_city' in cube.columns and 'destination_city' in cube.columns:
+        cube['route'] = derive_routes(cube['departure_city'], cube['destination_city'])
+    
+    return cube
+
+def rollup_cube(cube: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """
+    Re-aggregate cube cells to a coarser grouping.
+    
+    Args:
+        cube: Aggregate cube (see build_flight_cube)
+        by: Columns to group by (an empty list rolls everything into one row)
+        
+    Returns:
+        DataFrame with the summed measures plus price_mean, price_std,
+        occupancy_rate_mean and occupancy_rate_std
+    """
+    aggregations = {column: 'sum' for column in CUBE_SUM_MEASURES}
+    for column in CUBE_RANGE_MEASURES:
+        aggregations[f'{column}_min'] = 'min'
+        aggregations[f'{column}_max'] = 'max'
+    
+    if by:
+        rolled = cube.groupby(by, observed=True, dropna=False).agg(aggregations).reset_index()
+    else:
+        rolled = cube[list(aggregations)].agg(aggregations).to_frame().T.astype('float64')
+    
+    flights = rolled['flights'].astype('float64')
+    rolled['price_mean'] = rolled['price_sum'] / flights
+    rolled['occupancy_rate_mean'] = rolled['occupancy_rate_sum'] / flights
+    
+    # Sample standard deviations from the sums of squares
+    for measure in ['price', 'occupancy_rate']:
+        total = rolled[f'{measure}_sum']
+        variance = (rolled[f'{measure}_sq_sum'] - total ** 2 / flights) / (flights - 1)
+        rolled[f'{measure}_std'] = np.sqrt(variance.clip(lower=0).where(flights > 1))
+    
+    return rolled
+
+def insights_from_cube(cube: pd.DataFrame) -> Dict:
+    """
+    Answer the insights dictionary from the aggregate cube.
+    
+    Besides the insights themselves, the dictionary keeps the cube and its
+    per-route and per-date running totals so later deltas can be folded in
+    by update_dataset.
+    
+    Args:
+        cube: Aggregate cube (see build_flight_cube)
+        
+    Returns:
+        Insights dictionary (see insights_from_rollups) plus cube,
+        route_totals and daily_totals
+    """
+    route_totals = rollup_cube(cube, ['route']) if 'route' in cube.columns else None
+    daily_totals = rollup_cube(cube, ['date']) if 'date' in cube.columns else None
+    
+    insights = insights_from_rollups(route_totals, daily_totals)
+    insights['cube'] = cube
+    insights['route_totals'] = route_totals
+    insights['daily_totals'] = daily_totals
+    return insights
+
+def insights_from_rollups(route_totals: Optional[pd.DataFrame], daily_totals: Optional[pd.DataFrame]) -> Dict:
+    """
+    Answer the insights dictionary from per-route and per-date running totals.
+    
+    Args:
+        route_totals: Cube rolled up by route, or None
+        daily_totals: Cube rolled up by date, or None
+        
+    Returns:
+        Insights dictionary with popular_routes, price_trends,
+        demand_periods, route_prices, avg_occupancy, total_flights and
+        total_revenue
+    """
+    insights = {
+        'popular_routes': {},
+        'price_trends': pd.DataFrame(),
+        'demand_periods': pd.DataFrame(),
+        'route_prices': {},
+        'avg_occupancy': 0,
+        'total_flights': 0,
+        'total_revenue': 0
+    }
+    
+    # Top 5 popular routes and average prices by route
+    if route_totals is not None and not route_totals.empty:
+        popular = route_totals.sort_values('flights', ascending=False, kind='stable').head(5)
+        insights['popular_routes'] = dict(zip(popular['route'], popular['flights'].astype(int)))
+        priciest = route_totals.sort_values('price_mean', ascending=False, kind='stable').head(10)
+        insights['route_prices'] = dict(zip(priciest['route'], priciest['price_mean']))
+    
+    # Price trends and high-demand periods over time
+    if daily_totals is not None and not daily_totals.empty:
+        insights['price_trends'] = daily_totals[['date', 'price_mean']].rename(columns={'price_mean': 'price'})
+        insights['demand_periods'] = daily_totals[['date', 'flights']].rename(columns={'flights': 'flight_count'})
+    
+    totals = daily_totals if daily_totals is not None else route_totals
+    if totals is not None and not totals.empty:
+        flights = int(totals['flights'].sum())
+        insights['total_flights'] = flights
+        insights['avg_occupancy'] = totals['occupancy_rate_sum'].sum() / flights if flights else 0
+        insights['total_revenue'] = totals['revenue'].sum()
+    
+    return insights
+
+def concat_with_categories(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate frames while keeping categorical columns categorical.
+    
+    pd.concat falls back to object columns when categories differ. Here the
+    first frame's categories are extended (its codes stay valid) and the
+    other frames are recoded onto the combined categories.
+    
+    Args:
+        frames: Frames with the same columns, largest first
+        
+    Returns:
+        Concatenated DataFrame
+    """
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 1:
+        return frames[0]
+    
+    aligned = [frame.copy(deep=False) for frame in frames]
+    for column in frames[0].columns:
+        if not all(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames if column in frame.columns):
+            continue
+        categories = frames[0][column].cat.categories
+        for frame in frames[1:]:
+            categories = categories.append(frame[column].cat.categories.difference(categories, sort=False))
+        for frame in aligned:
+            frame[column] = frame[column].cat.set_categories(categories)
+    
+    return pd.concat(aligned, ignore_index=True)
+
+def merge_cube(cube: pd.DataFrame, delta_cube: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fold a delta cube into an existing cube.
+    
+    Only the cells of dates present in the delta are re-aggregated; all
+    other cells are carried over unchanged.
+    
+    Args:
+        cube: Existing aggregate cube
+        delta_cube: Cube of newly appended flights
+        
+    Returns:
+        Merged aggregate cube
+    """
+    if cube.empty:
+        return delta_cube
+    if delta_cube.empty:
+        return cube
+    
+    affected = cube['date'].isin(delta_cube['date'].unique()).to_numpy()
+    dimensions = [column for column in CUBE_DIMENSIONS if column in cube.columns]
+    combined = concat_with_categories([cube[affected], delta_cube])
+    merged_cells = rollup_cube(combined, dimensions)[list(cube.columns.drop('route', errors='ignore'))]
+    
+    merged = concat_with_categories([cube[~affected].drop(columns=['route'], errors='ignore'), merged_cells])
+    if 'departure_city' in merged.columns and 'destination_city' in merged.columns:
+        merged['route'] = derive_routes(merged['departure_city'], merged['destination_city'])
+    return merged
+
+def update_dataset(processed_df: pd.DataFrame, insights: Dict, new_flights: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Fold newly appended flights into a processed dataset incrementally.
+    
+    The new rows are processed and aggregated on their own and merged into
+    the running cube and per-route/per-date totals, so the cost follows
+    the size of the delta rather than the whole history.
+    
+    Args:
+        processed_df: Existing processed flight data
+        insights: Insights dictionary of processed_df (from process_data)
+        new_flights: Raw flights to append (must not repeat existing flights)
+        
+    Returns:
+        Tuple of (processed DataFrame, insights dictionary) including the new flights
+    """
+    new_processed = derive_flight_metrics(enforce_flight_schema(new_flights.copy()))
+    delta_cube = build_flight_cube(new_processed)
+    
+    route_totals = insights.get('route_totals')
+    if route_totals is not None and 'route' in delta_cube.columns:
+        route_totals = rollup_cube(concat_with_categories([route_totals, rollup_cube(delta_cube, ['route'])]), ['route'])
+    
+    daily_totals = insights.get('daily_totals')
+    if daily_totals is not None and 'date' in delta_cube.columns:
+        daily_totals = rollup_cube(concat_with_categories([daily_totals, rollup_cube(delta_cube, ['date'])]), ['date'])
+    
+    updated = insights_from_rollups(route_totals, daily_totals)
+    updated['cube'] = merge_cube(insights['cube'], delta_cube)
+    updated['route_totals'] = route_totals
+    updated['daily_totals'] = daily_totals
+    
+    combined_df = concat_with_categories([processed_df, sort_by_date(new_processed)])
+    combined_df.attrs = dict(processed_df.attrs)
+    combined_df = sort_by_date(combined_df)
+    updated['index'] = build_flight_index(combined_df)
+    updated['dataset_id'] = uuid.uuid4().hex
+    return combined_df, updated
+
+def build_filter_mask(df: pd.DataFrame, filters: Dict) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Compose all sidebar filters into one boolean mask.
+    
+    Dates are compared as datetime64 bounds (end date inclusive) and the
+    frame itself is never copied while the predicates are combined.
+    
+    Args:
+        df: Processed flight data DataFrame
+        filters: Filter selection with the keys departure_city,
+            destination_city, airline ("All" disables the filter),
+            start_date, end_date (dates or None) and price_range,
+            occupancy_range ((low, high) tuples or None)
+        
+    Returns:
+        Tuple of (row mask, flights remaining after each applied filter)
+    """
+    mask = np.ones(len(df), dtype=bool)
+    counts = {}
+    
+    def combine(label: str, predicate) -> None:
+        np.logical_and(mask, np.asarray(predicate, dtype=bool), out=mask)
+        counts[label] = int(mask.sum())
+    
+    for column, label in [('departure_city', 'departure city'), ('destination_city', 'destination city')]:
+        value = filters.get(column, "All")
+        if value != "All" and column in df.columns:
+            combine(label, (df[column] == value).to_numpy())
+    
+    if 'date' in df.columns and (filters.get('start_date') is not None or filters.get('end_date') is not None):
+        dates = df['date']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        dates = dates.to_numpy()
+        date_mask = np.ones(len(df), dtype=bool)
+        if filters.get('start_date') is not None:
+            date_mask &= dates >= np.datetime64(pd.Timestamp(filters['start_date']))
+        if filters.get('end_date') is not None:
+            date_mask &= dates < np.datetime64(pd.Timestamp(filters['end_date']) + pd.Timedelta(days=1))
+        combine('date range', date_mask)
+    
+    price_range = filters.get('price_range')
+    if price_range is not None and 'price' in df.columns:
+        prices = df['price'].to_numpy()
+        combine('price range', (prices >= price_range[0]) & (prices <= price_range[1]))
+    
+    airline = filters.get('airline', "All")
+    if airline != "All" and 'airline' in df.columns:
+        combine('airline', (df['airline'] == airline).to_numpy())
+    
+    occupancy_range = filters.get('occupancy_range')
+    if occupancy_range is not None and 'occupancy_rate' in df.columns:
+        rates = df['occupancy_rate'].to_numpy()
+        combine('occupancy', (rates >= occupancy_range[0]) & (rates <= occupancy_range[1]))
+    
+    return mask, counts
+
+def build_filter_positions(df: pd.DataFrame, filters: Dict, index: Dict) -> Tuple[Optional[np.ndarray], Dict[str, int]]:
+    """
+    Resolve the sidebar filters to row positions through the flight index.
+    
+    The filters narrow a sorted array of candidate positions in the same
+    order as build_filter_mask. The first indexed filter starts from its
+    posting list (or the date slice), date ranges are binary searches and
+    the remaining predicates are only evaluated on surviving candidates,
+    so the cost follows the number of matches rather than the frame size.
+    
+    Args:
+        df: Processed flight data DataFrame the index was built for
+        filters: Filter selection (see build_filter_mask)
+        index: Flight index (see build_flight_index)
+        
+    Returns:
+        Tuple of (ascending row positions, or None when every row matches,
+        flights remaining after each applied filter)
+    """
+    positions = None
+    counts = {}
+    
+    def narrow(label: str, column: str, predicate: Callable[[np.ndarray], np.ndarray]) -> None:
+        nonlocal positions
+        values = df[column].to_numpy() if positions is None else df[column].to_numpy()[positions]
+        keep = predicate(values)
+        positions = np.flatnonzero(keep) if positions is None else positions[keep]
+        counts[label] = len(positions)
+    
+    def select(label: str, column: str, value) -> None:
+        nonlocal positions
+        postings = index['postings'].get(column)
+        categories = df[column].cat.categories if isinstance(df[column].dtype, pd.CategoricalDtype) else None
+        if postings is None or categories is None:
+            narrow(label, column, lambda values: values == value)
+            return
+        code = categories.get_indexer([value])[0]
+        if positions is None:
+            order, offsets = postings
+            positions = order[offsets[code]:offsets[code + 1]] if code >= 0 else order[:0]
+        else:
+            codes = df[column].cat.codes.to_numpy()[positions]
+            positions = positions[codes == code] if code >= 0 else positions[:0]
+        counts[label] = len(positions)
+    
+    for column, label in [('departure_city', 'departure city'), ('destination_city', 'destination city')]:
+        value = filters.get(column, "All")
+        if value != "All" and column in df.columns:
+            select(label, column, value)
+    
+    if 'date' in df.columns and (filters.get('start_date') is not None or filters.get('end_date') is not None):
+        low = np.datetime64(pd.Timestamp(filters['start_date'])) if filters.get('start_date') is not None else None
+        high = np.datetime64(pd.Timestamp(filters['end_date']) + pd.Timedelta(days=1)) if filters.get('end_date') is not None else None
+        if index['date_sorted']:
+            dates = df['date'].to_numpy()
+            first = np.searchsorted(dates, low, side='left') if low is not None else 0
+            stop = np.searchsorted(dates, high, side='left') if high is not None else len(dates)
+            if positions is None:
+                positions = np.arange(first, stop)
+            else:
+                positions = positions[np.searchsorted(positions, first):np.searchsorted(positions, stop)]
+            counts['date range'] = len(positions)
+        else:
+            narrow('date range', 'date', lambda dates: (dates >= low if low is not None else True) & (dates < high if high is not None else True))
+    
+    price_range = filters.get('price_range')
+    if price_range is not None and 'price' in df.columns:
+        narrow('price range', 'price', lambda prices: (prices >= price_range[0]) & (prices <= price_range[1]))
+    
+    airline = filters.get('airline', "All")
+    if airline != "All" and 'airline' in df.columns:
+        select('airline', 'airline', airline)
+    
+    occupancy_range = filters.get('occupancy_range')
+    if occupancy_range is not None and 'occupancy_rate' in df.columns:
+        narrow('occupancy', 'occupancy_rate', lambda rates: (rates >= occupancy_range[0]) & (rates <= occupancy_range[1]))
+    
+    if positions is not None and len(positions) == len(df):
+        positions = None
+    return positions, counts
+
+def filter_cube(cube: pd.DataFrame, filters: Dict) -> Optional[pd.DataFrame]:
+    """
+    Apply the sidebar filters to the aggregate cube instead of the flights.
+    
+    City, date and airline filters select whole cells. Price and occupancy
+    ranges are answered from the per-cell min/max: cells entirely inside
+    the range are kept and cells entirely outside it are dropped. A cell
+    straddling a range boundary cannot be split without its flights.
+    
+    Args:
+        cube: Aggregate cube (see build_flight_cube)
+        filters: Filter selection (see build_filter_mask)
+        
+    Returns:
+        Cube of the filtered flights, or None when some cell straddles a
+        price or occupancy boundary and the cube must be rebuilt from rows
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    
+    for column in ['departure_city', 'destination_city', 'airline']:
+        value = filters.get(column, "All")
+        if value != "All" and column in cube.columns:
+            mask &= (cube[column] == value).to_numpy()
+    
+    if 'date' in cube.columns:
+        dates = cube['date'].to_numpy()
+        if filters.get('start_date') is not None:
+            mask &= dates >= np.datetime64(pd.Timestamp(filters['start_date']))
+        if filters.get('end_date') is not None:
+            mask &= dates < np.datetime64(pd.Timestamp(filters['end_date']) + pd.Timedelta(days=1))
+    
+    for column, key in [('price', 'price_range'), ('occupancy_rate', 'occupancy_range')]:
+        value_range = filters.get(key)
+        if value_range is None:
+            continue
+        if f'{column}_min' not in cube.columns:
+            return None
+        low = cube[f'{column}_min'].to_numpy()
+        high = cube[f'{column}_max'].to_numpy()
+        inside = (low >= value_range[0]) & (high <= value_range[1])
+        outside = (high < value_range[0]) | (low > value_range[1])
+        if (mask & ~inside & ~outside).any():
+            return None
+        mask &= inside
+    
+    if mask.all():
+        return cube
+    return cube[mask].reset_index(drop=True)
+
+def filtered_view(df: pd.DataFrame, insights: Dict, filters: Dict) -> Tuple[pd.DataFrame, Dict, Dict[str, int]]:
+    """
+    Filter the flights and answer the insights for the same selection.
+    
+    The insights come from the filtered cube whenever the selection lines
+    up with cube cells; otherwise only the filtered rows are aggregated.
+    
+    Args:
+        df: Processed flight data DataFrame
+        insights: Insights dictionary of df (from process_data)
+        filters: Filter selection (see build_filter_mask)
+        
+    Returns:
+        Tuple of (filtered DataFrame, insights of the filtered flights,
+        flights remaining after each applied filter)
+    """
+    filtered_df, counts = apply_filters(df, filters, insights.get('index'))
+    if len(filtered_df) == len(df):
+        return filtered_df, insights, counts
+    
+    cube = filter_cube(insights['cube'], filters) if 'cube' in insights else None
+    if cube is None:
+        cube = build_flight_cube(filtered_df)
+    return filtered_df, insights_from_cube(cube), counts
+
+def apply_filters(df: pd.DataFrame, filters: Dict, index: Optional[Dict] = None) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Apply the sidebar filters and materialize the result once.
+    
+    Args:
+        df: Processed flight data DataFrame
+        filters: Filter selection (see build_filter_mask)
+        index: Flight index of df (see build_flight_index); rows are
+            scanned with a mask when it is missing or stale
+        
+    Returns:
+        Tuple of (filtered DataFrame, flights remaining after each applied filter)
+    """
+    if index is not None and index['rows'] == len(df):
+        positions, counts = build_filter_positions(df, filters, index)
+        if positions is None:
+            return df, counts
+        return df.take(positions), counts
+    
+    mask, counts = build_filter_mask(df, filters)
+    if mask.all():
+        return df, counts
+    return df[mask], counts
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Pick the points of a series to keep with Largest-Triangle-Three-Buckets.
+    
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    kept point and the average of the next bucket, which preserves peaks
+    and troughs far better than taking every n-th point.
+    
+    Args:
+        x: Monotonic x values
+        y: Y values
+        threshold: Number of points to keep
+        
+    Returns:
+        Ascending indices of the kept points
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    x = x.astype('float64')
+    y = y.astype('float64')
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        stop = int((bucket + 1) * every) + 1
+        next_stop = min(int((bucket + 2) * every) + 1, n)
+        if stop < next_stop:
+            avg_x, avg_y = np.nanmean(x[stop:next_stop]), np.nanmean(y[stop:next_stop])
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        
+        area = np.abs((x[previous] - avg_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        indices[bucket + 1] = previous
+    
+    return indices
+
+def downsample_series(series: pd.DataFrame, x: str, y: str, max_points: int) -> pd.DataFrame:
+    """
+    Reduce a time series to at most max_points points with LTTB.
+    
+    Args:
+        series: DataFrame sorted by x
+        x: Date column
+        y: Value column
+        max_points: Largest number of points to keep
+        
+    Returns:
+        The same frame if it is small enough, otherwise the kept rows
+    """
+    if len(series) <= max_points:
+        return series
+    x_values = pd.to_datetime(series[x]).to_numpy().astype('datetime64[ns]').astype('int64')
+    return series.iloc[lttb_indices(x_values, series[y].to_numpy(), max_points)]
+
+def bucket_series(series: pd.DataFrame, x: str, y: str, max_points: int) -> Tuple[pd.DataFrame, int]:
+    """
+    Sum a daily series into equal multi-day buckets of at most max_points bars.
+    
+    Bars represent totals, so they are re-aggregated rather than sampled.
+    
+    Args:
+        series: DataFrame with one row per date
+        x: Date column
+        y: Value column to sum
+        max_points: Largest number of buckets
+        
+    Returns:
+        Tuple of (bucketed frame, days per bucket)
+    """
+    dates = pd.to_datetime(series[x])
+    if len(series) <= max_points:
+        return series, 1
+    span_days = (dates.max() - dates.min()).days + 1
+    days = int(np.ceil(span_days / max_points))
+    bucketed = series.assign(**{x: dates}).set_index(x)[y].resample(f'{days}D').sum().reset_index()
+    return bucketed, days
+
+def top_routes_with_other(route_totals: pd.DataFrame, measure: str, limit: int) -> pd.DataFrame:
+    """
+    Keep the top routes by a measure and fold the rest into one "Other" bar.
+    
+    Args:
+        route_totals: Cube rolled up by route (see rollup_cube)
+        measure: 'flights' or 'price_mean'
+        limit: Number of routes shown individually
+        
+    Returns:
+        DataFrame with Route and the measure, "Other" last when anything was folded
+    """
+    ranked = route_totals.sort_values(measure, ascending=False, kind='stable')
+    top = pd.DataFrame({'Route': ranked['route'].astype(str).head(limit), measure: ranked[measure].head(limit)})
+    rest = ranked.iloc[limit:]
+    if rest.empty:
+        return top
+    
+    # Averages of the folded routes are flight-weighted, counts are summed
+    if measure == 'price_mean':
+        other = rest['price_sum'].sum() / rest['flights'].sum()
+    else:
+        other = rest[measure].sum()
+    return pd.concat([top, pd.DataFrame({'Route': [f"Other ({len(rest)} routes)"], measure: [other]})], ignore_index=True)
+
+def route_summary_from_cube(cube: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the route performance summary by rolling up the aggregate cube.
+    
+    Args:
+        cube: Aggregate cube of the flights to summarize
+        
+    Returns:
+        DataFrame with one row per route, busiest first
+    """
+    routes = rollup_cube(cube, ['route'])
+    summary = pd.DataFrame({
+        'route': routes['route'].astype(str),
+        'price_mean': routes['price_mean'],
+        'price_min': routes['price_min'],
+        'price_max': routes['price_max'],
+        'occupancy_rate_mean': routes['occupancy_rate_mean'],
+        'flight_number_count': routes['flights'].astype(int),
+        'revenue_sum': routes['revenue']
+    }).round(2)
+    return summary.sort_values('flight_number_count', ascending=False, kind='stable').reset_index(drop=True)
+
+def generate_insights(insights: Dict) -> str:
+    """
+    Generate natural language insights from the data.
+    
+    Args:
+        insights: Dictionary containing processed insights
+        
+    Returns:
+        String with natural language insights
+    """
+    insight_text = []
+    
+    # Popular routes
+    if 'popular_routes' in insights and insights['popular_routes']:
+        try:
+            top_route = list(insights['popular_routes'].keys())[0]
+            top_count = list(insights['popular_routes'].values())[0]
+            insight_text.append(f"🎯 **Most Popular Route**: {top_route} with {top_count} flights")
+        except (IndexError, KeyError):
+            insight_text.append("🎯 **Popular Routes**: No route data available")
+    else:
+        insight_text.append("🎯 **Popular Routes**: No route data available")
+    
+    # Price analysis
+    if 'route_prices' in insights and insights['route_prices']:
+        try:
+            avg_price = np.mean(list(insights['route_prices'].values()))
+            insight_text.append(f"💰 **Average Route Price**: ${avg_price:.2f}")
+        except (ValueError, TypeError):
+            insight_text.append("💰 **Average Route Price**: No price data available")
+    else:
+        insight_text.append("💰 **Average Route Price**: No price data available")
+    
+    # Demand analysis
+    if 'demand_periods' in insights and not insights['demand_periods'].empty:
+        try:
+            max_demand_date = insights['demand_periods'].loc[insights['demand_periods']['flight_count'].idxmax(), 'date']
+            max_demand_count = insights['demand_periods']['flight_count'].max()
+            insight_text.append(f"📈 **Peak Demand**: {max_demand_date.strftime('%Y-%m-%d')} with {max_demand_count} flights")
+        except (KeyError, IndexError):
+            insight_text.append("📈 **Peak Demand**: No demand data available")
+    else:
+        insight_text.append("📈 **Peak Demand**: No demand data available")
+    
+    # Overall statistics
+    if 'total_flights' in insights:
+        insight_text.append(f"✈️ **Total Flights Analyzed**: {insights.get('total_flights', 0):,}")
+    
+    if 'avg_occupancy' in insights and not pd.isna(insights.get('avg_occupancy')):
+        insight_text.append(f"👥 **Average Occupancy Rate**: {insights['avg_occupancy']:.1f}%")
+    else:
+        insight_text.append("👥 **Average Occupancy Rate**: No occupancy data available")
+    
+    if 'total_revenue' in insights:
+        insight_text.append(f"💵 **Total Revenue**: ${insights.get('total_revenue', 0):,.2f}")
+    
+    return "\n\n".join(insight_text)
+
+@lru_cache(maxsize=1)
+def get_gemini_model():
+    """
+    Import and configure the Gemini client once per process.
+    
+    Returns:
+        google.generativeai GenerativeModel
+    """
+    import google.generativeai as genai
+    
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+def ask_gemini(prompt: str) -> str:
+    """
+    Send a prompt to Google Gemini.
+    
+    Args:
+        prompt: Prompt text
+        
+    Returns:
+        Response text
+    """
+    if not GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+    response = get_gemini_model().generate_content(
+        prompt, request_options={'timeout': INSIGHT_TIMEOUT_SECONDS}
+    )
+    return response.text
+
+def ask_stub(prompt: str) -> str:
+    """
+    Answer a prompt locally with canned insights (for tests and offline use).
+    
+    Args:
+        prompt: Prompt text
+        
+    Returns:
+        Bullet points echoing the data summary of the prompt
+    """
+    facts = [line.strip()[2:] for line in prompt.splitlines() if line.strip().startswith('- ')]
+    return "\n".join(f"- Stub insight on {fact}" for fact in facts)
+
+# AI insight providers selectable with INSIGHT_PROVIDER
+INSIGHT_PROVIDERS = {
+    'gemini': ask_gemini,
+    'stub': ask_stub
+}
+
+def gemini_data_summary(df: pd.DataFrame) -> Dict:
+    """
+    Summarize flight data into the inputs of the AI insight prompt.
+    
+    Args:
+        df: Processed DataFrame with flight data
+        
+    Returns:
+        Dictionary of prompt inputs
+    """
+    return {
+        'total_flights': len(df),
+        'date_range': f"{df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}" if 'date' in df.columns and not df.empty else "Unknown",
+        'airlines': int(df['airline'].nunique()) if 'airline' in df.columns else 0,
+        'routes': int(df['route'].nunique()) if 'route' in df.columns else 0,
+        'avg_price': f"${df['price'].mean():.2f}" if 'price' in df.columns else "N/A",
+        'avg_occupancy': f"{df['occupancy_rate'].mean():.1f}%" if 'occupancy_rate' in df.columns else "N/A"
+    }
+
+def insight_cache_key(data_summary: Dict, provider: str) -> str:
+    """
+    Identify an AI answer by its provider and prompt inputs.
+    
+    Args:
+        data_summary: Prompt inputs (see gemini_data_summary)
+        provider: Key of INSIGHT_PROVIDERS
+        
+    Returns:
+        Hex digest naming the cached answer
+    """
+    state = json.dumps({'provider': provider, 'model': GEMINI_MODEL, 'summary': data_summary}, sort_keys=True, default=str)
+    return hashlib.sha256(state.encode('utf-8')).hexdigest()[:32]
+
+def read_cached_insight(key: str) -> Optional[str]:
+    """
+    Return a cached AI answer, or None if it was never stored.
+    """
+    try:
+        with open(os.path.join(INSIGHT_CACHE_DIR, f"{key}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)['text']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def write_cached_insight(key: str, text: str) -> None:
+    """
+    Store an AI answer under INSIGHT_CACHE_DIR, replacing the file atomically.
+    """
+    try:
+        os.makedirs(INSIGHT_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=INSIGHT_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'text': text, 'created': datetime.now().isoformat()}, f)
+        os.replace(tmp_path, os.path.join(INSIGHT_CACHE_DIR, f"{key}.json"))
+    except OSError:
+        # The answer is still shown; it will just be requested again next time
+        pass
+
+def generate_gemini_insights(data_summary: Dict, provider: str = INSIGHT_PROVIDER) -> str:
+    """
+    Generate AI-powered insights, reusing the on-disk answer for the same inputs.
+    
+    Runs in a background worker (see gemini_panel); provider errors are raised.
+    
+    Args:
+        data_summary: Prompt inputs (see gemini_data_summary)
+        provider: Key of INSIGHT_PROVIDERS
+        
+    Returns:
+        Markdown with the AI-generated insights
+    """
+    key = insight_cache_key(data_summary, provider)
+    text = read_cached_insight(key)
+    if text is None:
+        prompt = f"""
+        Analyze this airline market data and provide 3-5 key business insights:
+        
+        Data Summary:
+        - Total Flights: {data_summary['total_flights']}
+        - Date Range: {data_summary['date_range']}
+        - Airlines: {data_summary['airlines']}
+        - Routes: {data_summary['routes']}
+        - Average Price: {data_summary['avg_price']}
+        - Average Occupancy: {data_summary['avg_occupancy']}
+        
+        Please provide:
+        1. Market trends and patterns
+        2. Revenue optimization opportunities
+        3. Route performance analysis
+        4. Competitive insights
+        5. Recommendations for airlines
+        
+        Format as bullet points with clear, actionable insights.
+        """
+        text = INSIGHT_PROVIDERS[provider](prompt)
+        if not text:
+            return "🤖 **AI Insights**: Unable to generate insights at this time."
+        write_cached_insight(key, text)
+    return f"🤖 **AI-Powered Insights**\n\n{text}"
+
+def iter_csv_chunks(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Serialize a DataFrame to UTF-8 CSV one block of rows at a time.
+    
+    Args:
+        df: DataFrame to serialize
+        chunk_rows: Rows per chunk
+        
+    Yields:
+        Encoded CSV chunks, the first one starting with the header row
+    """
+    if df.empty:
+        yield df.to_csv(index=False).encode('utf-8')
+        return
+    
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0).encode('utf-8')
+
+def write_flight_export(df: pd.DataFrame, target: BinaryIO, format_type: str = "csv",
+                        chunk_rows: int = EXPORT_CHUNK_ROWS,
+                        progress: Optional[Callable[[float], None]] = None) -> None:
+    """
+    Stream flight data into a binary file object.
+    
+    Only one chunk of rows is serialized at a time, so memory stays bounded
+    however large the frame is.
+    
+    Args:
+        df: Flight data to export
+        target: Writable binary file object
+        format_type: One of DATA_EXPORT_FORMATS ("csv", "csv.gz" or "parquet")
+        chunk_rows: Rows serialized per chunk (Parquet row group size)
+        progress: Optional callback receiving the completed fraction (0-1)
+    """
+    def report(chunk_number: int) -> None:
+        if progress is not None:
+            progress(min(chunk_number * chunk_rows / max(len(df), 1), 1.0))
+    
+    if format_type == "csv":
+        for number, chunk in enumerate(iter_csv_chunks(df, chunk_rows), 1):
+            target.write(chunk)
+            report(number)
+    
+    elif format_type == "csv.gz":
+        with gzip.GzipFile(fileobj=target, mode='wb', compresslevel=6) as gz:
+            for number, chunk in enumerate(iter_csv_chunks(df, chunk_rows), 1):
+                gz.write(chunk)
+                report(number)
+    
+    elif format_type == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+        with pq.ParquetWriter(target, schema, compression='snappy') as writer:
+            for number, start in enumerate(range(0, len(df), chunk_rows), 1):
+                writer.write_table(pa.Table.from_pandas(df.iloc[start:start + chunk_rows], schema=schema, preserve_index=False))
+                report(number)
+    
+    else:
+        raise ValueError(f"Unsupported format: {format_type}")
+
+def export_flights(df: pd.DataFrame, format_type: str = "csv",
+                   progress: Optional[Callable[[float], None]] = None) -> bytes:
+    """
+    Export flight data for a download button.
+    
+    The export is spooled through a temporary file, so the only full copy
+    held in memory is the finished file handed to Streamlit.
+    
+    Args:
+        df: Flight data to export
+        format_type: One of DATA_EXPORT_FORMATS ("csv", "csv.gz" or "parquet")
+        progress: Optional callback receiving the completed fraction (0-1)
+        
+    Returns:
+        Bytes of the exported file
+    """
+    with tempfile.TemporaryFile() as spool:
+        write_flight_export(df, spool, format_type, progress=progress)
+        spool.seek(0)
+        return spool.read()
+
+def iter_excel_rows(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[tuple]:
+    """
+    Yield DataFrame rows as tuples of values openpyxl can write.
+    
+    Columns are converted a chunk at a time: categories become their
+    labels, timestamps become datetimes and missing values become None.
+    
+    Args:
+        df: DataFrame to convert
+        chunk_rows: Rows converted per chunk
+        
+    Yields:
+        One tuple per row
+    """
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        columns = []
+        for column in chunk.columns:
+            series = chunk[column]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                values = series.dt.to_pydatetime().astype(object)
+            elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                as_float = pd.api.types.is_float_dtype(series) or series.hasnans
+                values = series.to_numpy(dtype='float64' if as_float else 'int64', na_value=np.nan if as_float else None).tolist()
+            else:
+                values = series.astype(object).to_numpy()
+            values = [None if value is None or value != value or value is pd.NaT else value for value in values]
+            columns.append(values)
+        yield from zip(*columns)
+
+def write_excel_export(sheets: Dict[str, pd.DataFrame], target: BinaryIO,
+                       progress: Optional[Callable[[float], None]] = None) -> None:
+    """
+    Write DataFrames to an xlsx workbook with openpyxl's write-only mode.
+    
+    Rows are streamed to the sheet instead of building a cell object per
+    value in memory. Frames longer than EXCEL_MAX_ROWS continue on
+    numbered sheets ("Flight Data (2)", ...).
+    
+    Args:
+        sheets: Sheet name to DataFrame, in sheet order
+        target: Writable binary file object
+        progress: Optional callback receiving the completed fraction (0-1)
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    
+    workbook = Workbook(write_only=True)
+    header_font = Font(bold=True)
+    total_rows = max(sum(len(df) for df in sheets.values()), 1)
+    written = 0
+    
+    for name, df in sheets.items():
+        for part, start in enumerate(range(0, max(len(df), 1), EXCEL_MAX_ROWS), 1):
+            sheet = workbook.create_sheet(name if part == 1 else f"{name} ({part})")
+            header = []
+            for column in df.columns:
+                cell = WriteOnlyCell(sheet, value=str(column))
+                cell.font = header_font
+                header.append(cell)
+            sheet.append(header)
+            for row in iter_excel_rows(df.iloc[start:start + EXCEL_MAX_ROWS]):
+                sheet.append(row)
+                written += 1
+                if progress is not None and written % 10_000 == 0:
+                    progress(written / total_rows)
+    
+    workbook.save(target)
+
+def export_excel(sheets: Dict[str, pd.DataFrame], progress: Optional[Callable[[float], None]] = None) -> bytes:
+    """
+    Build an xlsx workbook for a download button.
+    
+    Args:
+        sheets: Sheet name to DataFrame, in sheet order
+        progress: Optional callback receiving the completed fraction (0-1)
+        
+    Returns:
+        Bytes of the workbook
+    """
+    with tempfile.TemporaryFile() as spool:
+        write_excel_export(sheets, spool, progress)
+        spool.seek(0)
+        return spool.read()
+
+def export_fingerprint(dataset_key: Tuple, dataset_id: Optional[str], filters: Dict) -> str:
+    """
+    Identify an export by the dataset and filter selection it was built from.
+    
+    Args:
+        dataset_key: Key the dataset was loaded with (see load_dataset)
+        dataset_id: Build identifier of the dataset (insights['dataset_id']),
+            which changes when an expired dataset is refreshed in place
+        filters: Filter selection (see build_filter_mask)
+        
+    Returns:
+        Hex digest that changes whenever the exported rows could change
+    """
+    state = repr((dataset_key, dataset_id, sorted(filters.items())))
+    return hashlib.sha256(state.encode('utf-8')).hexdigest()[:16]
+
+@lru_cache(maxsize=1)
+def get_pdf_styles() -> Dict:
+    """
+    Return the paragraph and table styles of PDF reports.
+    
+    Styles are created once per process; every report and table reuses
+    the same objects.
+    
+    Returns:
+        Dictionary with title, heading1, heading2, normal, summary_table
+        and data_table styles
+    """
+    sample_styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=sample_styles['Title'],
+            fontSize=24,
+            spaceAfter=30,
+            alignment=1  # Center alignment
+        ),
+        'heading1': sample_styles['Heading1'],
+        'heading2': sample_styles['Heading2'],
+        'normal': sample_styles['Normal'],
+        'summary_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 14),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]),
+        'data_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 7),
+            ('TOPPADDING', (0, 0), (-1, -1), 1),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.white]),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.black)
+        ])
+    }
+
+def pdf_column_strings(series: pd.Series) -> List[str]:
+    """
+    Format one DataFrame column as table cell strings in a single pass.
+    
+    Args:
+        series: Column to format
+        
+    Returns:
+        Cell strings (dates as YYYY-MM-DD, floats with two decimals,
+        missing values empty)
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d').fillna('').tolist()
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        return np.where(np.isnan(values), '', np.char.mod('%.2f', values)).tolist()
+    return series.astype(object).where(series.notna(), '').astype(str).tolist()
+
+def pdf_data_table(df: pd.DataFrame, width: float) -> LongTable:
+    """
+    Build a PDF table that splits across pages with a repeated header row.
+    
+    Cells are built from column arrays and the column widths and row
+    heights are fixed up front, so reportlab does not have to measure
+    every cell each time the table is split at a page break.
+    
+    Args:
+        df: Rows to render
+        width: Available table width in points
+        
+    Returns:
+        LongTable flowable
+    """
+    columns = [pdf_column_strings(df[column]) for column in df.columns]
+    header = [str(column) for column in df.columns]
+    data = [header] + [list(row) for row in zip(*columns)]
+    
+    # Width shares from the longest of the header and the first few hundred cells
+    weights = np.array([
+        min(max([len(name)] + [len(value) for value in values[:500]]), 40) + 2
+        for name, values in zip(header, columns)
+    ], dtype=float)
+    col_widths = (weights / weights.sum() * width).tolist()
+    
+    table = LongTable(data, colWidths=col_widths, rowHeights=PDF_TABLE_ROW_HEIGHT, repeatRows=1)
+    table.setStyle(get_pdf_styles()['data_table'])
+    return table
+
+def pdf_bar_chart(labels: List[str], values: List[float], width: float, title: str) -> Drawing:
+    """
+    Draw a horizontal bar chart as a vector image for PDF reports.
+    
+    Args:
+        labels: Bar labels, top to bottom
+        values: Bar values
+        width: Drawing width in points
+        title: Chart title
+        
+    Returns:
+        Drawing flowable
+    """
+    bar_height = 14
+    height = bar_height * len(labels) + 50
+    drawing = Drawing(width, height)
+    chart = HorizontalBarChart()
+    chart.x, chart.y = 150, 20
+    chart.width, chart.height = width - 170, bar_height * len(labels)
+    # Bars are drawn bottom-up, so reverse to keep the first label on top
+    chart.data = [list(reversed(values))]
+    chart.categoryAxis.categoryNames = list(reversed(labels))
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    chart.bars[0].fillColor = colors.HexColor('#00d4aa')
+    drawing.add(chart)
+    drawing.add(String(width / 2, height - 12, title, textAnchor='middle', fontName='Helvetica-Bold', fontSize=9))
+    return drawing
+
+def pdf_line_chart(dates: pd.Series, values: pd.Series, width: float, title: str) -> Drawing:
+    """
+    Draw a time series line chart as a vector image for PDF reports.
+    
+    Args:
+        dates: X values (datetimes)
+        values: Y values
+        width: Drawing width in points
+        title: Chart title
+        
+    Returns:
+        Drawing flowable
+    """
+    height = 180
+    drawing = Drawing(width, height)
+    days = (pd.to_datetime(dates).to_numpy().astype('datetime64[D]').astype('int64')).tolist()
+    chart = LinePlot()
+    chart.x, chart.y = 50, 30
+    chart.width, chart.height = width - 70, height - 60
+    chart.data = [list(zip(days, pd.Series(values).astype('float64').tolist()))]
+    chart.lines[0].strokeColor = colors.HexColor('#ff4b4b')
+    chart.xValueAxis.labelTextFormat = lambda day: str(np.datetime64(int(day), 'D'))
+    chart.xValueAxis.labels.fontSize = 7
+    chart.xValueAxis.labels.angle = 30
+    chart.xValueAxis.labels.boxAnchor = 'ne'
+    chart.yValueAxis.labels.fontSize = 7
+    drawing.add(chart)
+    drawing.add(String(width / 2, height - 12, title, textAnchor='middle', fontName='Helvetica-Bold', fontSize=9))
+    return drawing
+
+def build_pdf_report(df: pd.DataFrame, insights: Dict,
+                     progress: Optional[Callable[[float], None]] = None) -> bytes:
+    """
+    Build the PDF analysis report.
+    
+    The report holds the executive summary, key insights, charts of the
+    busiest routes and daily demand, the complete route summary and up to
+    PDF_MAX_FLIGHT_ROWS flight records. Long tables continue across pages
+    with their header repeated.
+    
+    Args:
+        df: Processed DataFrame with flight data
+        insights: Dictionary containing processed insights
+        progress: Optional callback receiving the completed fraction (0-1)
+        
+    Returns:
+        Bytes of the PDF file
+    """
+    styles = get_pdf_styles()
+    pdf_buffer = io.BytesIO()
+    
+    # Create PDF using reportlab
+    doc = SimpleDocTemplate(pdf_buffer, pagesize=letter)
+    story = []
+    
+    # Title
+    story.append(Paragraph("✈️ Airline Market Demand Analysis Report", styles['title']))
+    story.append(Spacer(1, 20))
+    
+    # Executive Summary
+    story.append(Paragraph("Executive Summary", styles['heading1']))
+    story.append(Spacer(1, 12))
+    
+    summary_data = [
+        ['Metric', 'Value'],
+        ['Total Flights', str(insights.get('total_flights', 0))],
+        ['Date Range', f"{df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}" if 'date' in df.columns and not df.empty else "N/A"],
+        ['Average Price', f"${insights.get('avg_price', 0):.2f}"],
+        ['Average Occupancy', f"{insights.get('avg_occupancy', 0):.1f}%"],
+        ['Total Revenue', f"${insights.get('total_revenue', 0):,.2f}"]
+    ]
+    
+    summary_table = Table(summary_data)
+    summary_table.setStyle(styles['summary_table'])
+    story.append(summary_table)
+    story.append(Spacer(1, 20))
+    
+    # Key Insights
+    story.append(Paragraph("Key Insights", styles['heading1']))
+    story.append(Spacer(1, 12))
+    
+    if 'popular_routes' in insights and insights['popular_routes']:
+        story.append(Paragraph("Most Popular Routes:", styles['heading2']))
+        for i, (route, count) in enumerate(list(insights['popular_routes'].items())[:5]):
+            story.append(Paragraph(f"{i+1}. {route}: {count} flights", styles['normal']))
+        story.append(Spacer(1, 12))
+        story.append(pdf_bar_chart([str(route) for route in insights['popular_routes']],
+                                   [float(count) for count in insights['popular_routes'].values()],
+                                   doc.width, "Flights on the busiest routes"))
+        story.append(Spacer(1, 12))
+    
+    if 'route_prices' in insights and insights['route_prices']:
+        story.append(Paragraph("Route Price Analysis:", styles['heading2']))
+        avg_price = np.mean(list(insights['route_prices'].values()))
+        story.append(Paragraph(f"Average route price: ${avg_price:.2f}", styles['normal']))
+        story.append(Spacer(1, 12))
+    
+    demand = insights.get('demand_periods')
+    if demand is not None and len(demand) > 1:
+        story.append(pdf_line_chart(demand['date'], demand['flight_count'], doc.width, "Flights per day"))
+        story.append(Spacer(1, 12))
+    
+    # Complete route summary
+    cube = insights.get('cube')
+    if cube is not None and 'route' in cube.columns and not cube.empty:
+        story.append(Paragraph("Route Summary", styles['heading1']))
+        story.append(Spacer(1, 12))
+        story.append(pdf_data_table(route_summary_from_cube(cube), doc.width))
+        story.append(Spacer(1, 20))
+    
+    # Flight records
+    if not df.empty:
+        shown = min(len(df), PDF_MAX_FLIGHT_ROWS)
+        story.append(Paragraph(f"Flight Records (first {shown:,} of {len(df):,})", styles['heading1']))
+        story.append(Spacer(1, 12))
+        story.append(pdf_data_table(df.head(shown), doc.width))
+    
+    if progress is not None:
+        size = {'total': 1}
+        
+        def report(kind: str, value: int) -> None:
+            if kind == 'SIZE_EST':
+                size['total'] = max(value, 1)
+            elif kind == 'PROGRESS':
+                progress(min(value / size['total'], 1.0))
+        
+        doc.setProgressCallBack(report)
+    
+    # Build PDF
+    doc.build(story)
+    return pdf_buffer.getvalue()
+
+def excel_report_sheets(df: pd.DataFrame, insights: Dict) -> Dict[str, pd.DataFrame]:
+    """
+    Assemble the sheets of the Excel report (main data sheet first).
+    
+    Args:
+        df: Processed DataFrame with flight data
+        insights: Dictionary containing processed insights
+        
+    Returns:
+        Mapping of sheet name to DataFrame
+    """
+    sheets = {'Flight Data': df}
+    
+    # Insights summary sheet
+    sheets['Insights Summary'] = pd.DataFrame([
+        ['Total Flights', insights.get('total_flights', 0)],
+        ['Average Price', f"${insights.get('avg_price', 0):.2f}"],
+        ['Average Occupancy', f"{insights.get('avg_occupancy', 0):.1f}%"],
+        ['Total Revenue', f"${insights.get('total_revenue', 0):,.2f}"],
+        ['Unique Airlines', insights.get('unique_airlines', 0)],
+        ['Unique Routes', insights.get('unique_routes', 0)]
+    ], columns=['Metric', 'Value'])
+    
+    # Route summary sheet
+    if 'cube' in insights and 'route' in insights['cube'].columns:
+        sheets['Route Summary'] = route_summary_from_cube(insights['cube'])
+    
+    # Popular routes sheet
+    if 'popular_routes' in insights and insights['popular_routes']:
+        sheets['Popular Routes'] = pd.DataFrame(list(insights['popular_routes'].items()), 
+                                                columns=['Route', 'Flight Count'])
+    
+    # Price analysis sheet
+    if 'route_prices' in insights and insights['route_prices']:
+        sheets['Route Prices'] = pd.DataFrame(list(insights['route_prices'].items()), 
+                                              columns=['Route', 'Average Price'])
+    
+    return sheets
+
+def build_report(df: pd.DataFrame, insights: Dict, format_type: str = "csv",
+                 progress: Optional[Callable[[float], None]] = None) -> bytes:
+    """
+    Build an export file of flight data and insights.
+    
+    Failures are raised rather than shown, so it can run in a background
+    export worker or a batch job.
+    
+    Args:
+        df: Processed DataFrame with flight data
+        insights: Dictionary containing processed insights
+        format_type: Export format ("csv", "csv.gz", "parquet", "excel", or "pdf")
+        progress: Optional callback receiving the completed fraction (0-1)
+        
+    Returns:
+        Bytes object containing the exported file
+    """
+    if format_type in DATA_EXPORT_FORMATS:
+        # Export filtered data in streamed chunks
+        return export_flights(df, format_type, progress)
+        
+    elif format_type == "excel":
+        # Export to Excel with multiple sheets (main data sheet first)
+        return export_excel(excel_report_sheets(df, insights), progress)
+        
+    elif format_type == "pdf":
+        # Create a comprehensive PDF report
+        return build_pdf_report(df, insights, progress)
+        
+    else:
+        raise ValueError(f"Unsupported format: {format_type}")
+
+def write_report(df: pd.DataFrame, insights: Dict, target: BinaryIO, format_type: str = "csv",
+                 progress: Optional[Callable[[float], None]] = None) -> None:
+    """
+    Write an export file of flight data and insights to a binary file object.
+    
+    Data and Excel exports are streamed straight into target, so batch runs
+    write large selections to disk without holding the file in memory.
+    
+    Args:
+        df: Processed DataFrame with flight data
+        insights: Dictionary containing processed insights
+        target: Writable binary file object
+        format_type: Export format ("csv", "csv.gz", "parquet", "excel", or "pdf")
+        progress: Optional callback receiving the completed fraction (0-1)
+    """
+    if format_type in DATA_EXPORT_FORMATS:
+        write_flight_export(df, target, format_type, progress=progress)
+    elif format_type == "excel":
+        write_excel_export(excel_report_sheets(df, insights), target, progress)
+    else:
+        target.write(build_report(df, insights, format_type, progress))
+
+class ExportJobs:
+    """
+    Export files built by background workers, memoized by (fingerprint, format).
+    
+    A job is submitted once per key; sessions asking for the same export
+    share the running build and its result. Finished jobs are evicted
+    least recently used first beyond max_jobs, or while the files they
+    hold add up to more than max_bytes (the newest one is always kept).
+    """
+    
+    def __init__(self, max_jobs: int = EXPORT_CACHE_JOBS, workers: int = EXPORT_WORKERS, name: str = 'export',
+                 max_bytes: int = EXPORT_CACHE_MB * 1024 * 1024):
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key: Tuple[str, str]) -> Optional[Dict]:
+        """
+        Return the job for a key, or None if it was never submitted.
+        
+        Args:
+            key: (export fingerprint, format type)
+            
+        Returns:
+            Job dictionary with future and progress (0-1)
+        """
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None:
+                self.jobs.move_to_end(key)
+            return job
+    
+    def submit(self, key: Tuple[str, str], build: Callable[[Callable[[float], None]], bytes]) -> Dict:
+        """
+        Start building an export unless the same export already exists.
+        
+        Args:
+            key: (export fingerprint, format type)
+            build: Callable producing the file bytes; it receives a progress
+                callback taking the completed fraction
+            
+        Returns:
+            Job dictionary with future, progress (0-1) and start time
+        """
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None:
+                return job
+            
+            job = {'progress': 0.0, 'future': None, 'started': time.monotonic()}
+            
+            def report(fraction: float) -> None:
+                job['progress'] = min(max(fraction, 0.0), 1.0)
+            
+            job['future'] = self.executor.submit(build, report)
+            self.jobs[key] = job
+            self._evict()
+        
+        # Finished files count against max_bytes, so evict again once it is built
+        job['future'].add_done_callback(lambda _: self._evict_locked())
+        return job
+    
+    def discard(self, key: Tuple[str, str]) -> None:
+        """
+        Forget a job (e.g. a failed one) so it can be submitted again.
+        """
+        with self.lock:
+            self.jobs.pop(key, None)
+    
+    def _evict_locked(self) -> None:
+        with self.lock:
+            self._evict()
+    
+    @staticmethod
+    def _job_bytes(job: Dict) -> int:
+        future = job['future']
+        if not future.done() or future.cancelled() or future.exception() is not None:
+            return 0
+        result = future.result()
+        return len(result) if isinstance(result, (bytes, bytearray)) else 0
+    
+    def _evict(self) -> None:
+        # Running builds are never dropped; the least recently used finished ones are
+        finished = [key for key, job in self.jobs.items() if job['future'].done()]
+        total = sum(self._job_bytes(self.jobs[key]) for key in finished)
+        while finished and (len(self.jobs) > self.max_jobs or (total > self.max_bytes and len(finished) > 1)):
+            total -= self._job_bytes(self.jobs.pop(finished.pop(0)))
@@ -2,23 +2,34 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
-import requests
-import json
+import logging
+import threading
 from datetime import datetime, timedelta
-import os
-from dotenv import load_dotenv
 import numpy as np
 import time
-from typing import Dict, List, Optional, Tuple
-import io
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+import hashlib
+import inspect
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import core
+from core import (
+    AVIATIONSTACK_API_KEY, DATASET_LEASE_SECONDS, DATASET_MEMORY_LIMIT_MB, DATA_CACHE_TTL,
+    DATA_EXPORT_FORMATS, EXPORT_FORMATS, GEMINI_API_KEY, INSIGHT_PROVIDER, INSIGHT_PROVIDERS,
+    INSIGHT_TIMEOUT_SECONDS, OPENSKY_BACKFILL_MAX_DAYS, PROVIDER_RATE_LIMITS, SAMPLE_CITIES, DatasetRegistry, ExportJobs,
+    api_config_fingerprint, backfill_duration, backfill_opensky_data, bucket_series, build_report, dataset_nbytes,
+    downsample_series, export_fingerprint, fetch_flight_data, filtered_view, gemini_data_summary,
+    generate_gemini_insights, generate_insights, get_data_source, get_rate_limiter,
+    insight_cache_key, process_data, read_cached_insight, refresh_dataset, rollup_cube,
+    route_summary_from_cube, top_routes_with_other
+)
 
-# Load environment variables
-load_dotenv()
+# Shared datasets are handed to every session; copy-on-write keeps them immutable.
+# Set here rather than in core so importing core leaves pandas options alone.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
 # Page configuration with dark theme
 st.set_page_config(
@@ -368,763 +379,690 @@ st.markdown("""
 
 
 
-# Constants
-AVIATIONSTACK_API_KEY = os.getenv('AVIATIONSTACK_API_KEY')
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+# Constants (pipeline settings live in core.py)
+# Seconds between progress polls of a background export
+EXPORT_POLL_SECONDS = 0.5
+
+# Largest number of points/bars each chart sends to the browser
+CHART_MAX_POINTS = {
+    'popular_routes': 5,
+    'price_trends': 1000,
+    'demand_periods': 400,
+    'route_prices': 10
+}
 
-# Sample data for demonstration when APIs are not available
-SAMPLE_CITIES = [
-    'New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix',
-    'Philadelphia', 'San Antonio', 'San Diego', 'Dallas', 'San Jose',
-    'Miami', 'Atlanta', 'Denver', 'Seattle', 'Portland'
-]
+# Plotly template of the dashboard theme and number of built figures kept
+CHART_TEMPLATE = 'airline_dark'
+CHART_CACHE_SIZE = 64
+CHART_CONFIG = {'displayModeBar': True, 'displaylogo': False}
 
-def generate_sample_data(days: int = 30) -> pd.DataFrame:
+# Raw data table: selectable page sizes (rows) and cached sort orders
+TABLE_PAGE_SIZES = [50, 100, 500, 1000]
+TABLE_SORT_CACHE_SIZE = 8
+
+class StreamlitLogHandler(logging.Handler):
+    """
+    Show messages of the core pipeline on the page of the run that logged them.
     """
-    Generate sample airline data for demonstration purposes.
     
-    Args:
-        days: Number of days to generate data for
-        
-    Returns:
-        DataFrame with sample airline data
-    """
-    np.random.seed(42)
-    
-    # Generate dates
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    dates = pd.date_range(start=start_date, end=end_date, freq='D')
-    
-    data = []
-    
-    # Define popular routes that should always have flights
-    popular_routes = [
-        ('New York', 'Los Angeles'),
-        ('New York', 'Chicago'),
-        ('Los Angeles', 'Chicago'),
-        ('Chicago', 'Miami'),
-        ('Denver', 'Seattle'),
-        ('New York', 'Miami'),
-        ('Los Angeles', 'Miami'),
-        ('Atlanta', 'New York'),
-        ('Dallas', 'Los Angeles'),
-        ('Houston', 'Chicago')
-    ]
-    
-    for date in dates:
-        # Generate 20-50 flights per day
-        num_flights = np.random.randint(20, 51)
-        
-        # Ensure popular routes always have at least 1 flight per day
-        for departure, destination in popular_routes:
-            # Random flight details
-            airline = np.random.choice(['American Airlines', 'Delta', 'United', 'Southwest', 'JetBlue'])
-            flight_number = f"{airline[:2].upper()}{np.random.randint(100, 9999)}"
-            
-            # Simulate price based on route popularity and date
-            base_price = np.random.uniform(200, 800)
-            # Weekend and holiday premiums
-            if date.weekday() >= 5:  # Weekend
-                base_price *= 1.3
-            # Summer months premium
-            if date.month in [6, 7, 8]:
-                base_price *= 1.2
-            price = round(base_price + np.random.uniform(-50, 100), 2)
-            
-            # Random capacity and occupancy
-            capacity = np.random.randint(100, 300)
-            occupancy = np.random.randint(50, capacity)
-            
-            data.append({
-                'date': date,
-                'departure_city': departure,
-                'destination_city': destination,
-                'airline': airline,
-                'flight_number': flight_number,
-                'price': price,
-                'capacity': capacity,
-                'occupancy': occupancy,
-                'route': f"{departure} → {destination}"
-            })
-        
-        # Generate additional random flights
-        remaining_flights = num_flights - len(popular_routes)
-        for _ in range(remaining_flights):
-            # Random route
-            departure = np.random.choice(SAMPLE_CITIES)
-            destination = np.random.choice([city for city in SAMPLE_CITIES if city != departure])
-            
-            # Random flight details
-            airline = np.random.choice(['American Airlines', 'Delta', 'United', 'Southwest', 'JetBlue'])
-            flight_number = f"{airline[:2].upper()}{np.random.randint(100, 9999)}"
-            
-            # Simulate price based on route popularity and date
-            base_price = np.random.uniform(200, 800)
-            # Weekend and holiday premiums
-            if date.weekday() >= 5:  # Weekend
-                base_price *= 1.3
-            # Summer months premium
-            if date.month in [6, 7, 8]:
-                base_price *= 1.2
-            price = round(base_price + np.random.uniform(-50, 100), 2)
-            
-            # Random capacity and occupancy
-            capacity = np.random.randint(100, 300)
-            occupancy = np.random.randint(50, capacity)
-            
-            data.append({
-                'date': date,
-                'departure_city': departure,
-                'destination_city': destination,
-                'airline': airline,
-                'flight_number': flight_number,
-                'price': price,
-                'capacity': capacity,
-                'occupancy': occupancy,
-                'route': f"{departure} → {destination}"
-            })
-    
-    df = pd.DataFrame(data)
-    st.info(f"📊 Generated {len(df)} sample flights for demonstration")
-    return df
+    def emit(self, record: logging.LogRecord) -> None:
+        message = self.format(record)
+        if record.levelno >= logging.ERROR:
+            st.error(message)
+        elif record.levelno >= logging.WARNING:
+            st.warning(message)
+        elif getattr(record, 'status', None) == 'success':
+            st.success(message)
+        else:
+            st.info(message)
 
-def fetch_aviationstack_data() -> Optional[pd.DataFrame]:
+def streamlit_worker_context() -> Optional[Callable[[], None]]:
     """
-    Fetch data from AviationStack API.
-    
-    Returns:
-        DataFrame with flight data or None if API is not available
+    Return a thread initializer that lets pool threads write into the current page.
     """
-    if not AVIATIONSTACK_API_KEY:
-        return None
-    
     try:
-        # AviationStack API endpoint
-        url = "http://api.aviationstack.com/v1/flights"
-        params = {
-            'access_key': AVIATIONSTACK_API_KEY,
-            'limit': 100  # Free tier limit
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            if 'data' in data and data['data']:
-                flights = []
-                for flight in data['data']:
-                    if flight.get('departure') and flight.get('arrival'):
-                        flights.append({
-                            'date': datetime.now().date(),
-                            'departure_city': flight['departure'].get('airport', 'Unknown'),
-                            'destination_city': flight['arrival'].get('airport', 'Unknown'),
-                            'airline': flight.get('airline', {}).get('name', 'Unknown'),
-                            'flight_number': flight.get('flight', {}).get('iata', 'Unknown'),
-                            'price': np.random.uniform(200, 800),  # Simulated price
-                            'capacity': np.random.randint(100, 300),
-                            'occupancy': np.random.randint(50, 300),
-                            'route': f"{flight['departure'].get('airport', 'Unknown')} → {flight['arrival'].get('airport', 'Unknown')}"
-                        })
-                
-                return pd.DataFrame(flights)
-        
-        return None
-        
-    except Exception as e:
-        st.warning(f"AviationStack API error: {e}")
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
         return None
+    ctx = get_script_run_ctx()
+    
+    def initializer() -> None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+    return initializer
 
-def fetch_opensky_data() -> Optional[pd.DataFrame]:
+@st.cache_resource
+def install_core_logging() -> StreamlitLogHandler:
     """
-    Fetch data from OpenSky Network API.
+    Route core log messages to the page once per process (the script reruns often).
     
     Returns:
-        DataFrame with flight data or None if API is not available
+        The installed handler
     """
-    try:
-        # OpenSky Network API endpoint (no API key required for basic usage)
-        end_time = int(time.time())
-        start_time = end_time - (24 * 60 * 60)  # Last 24 hours
-        
-        url = f"https://opensky-network.org/api/flights/all"
-        params = {
-            'begin': start_time,
-            'end': end_time
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            if data:
-                flights = []
-                for flight in data[:100]:  # Limit to 100 flights
-                    if flight.get('estDepartureAirport') and flight.get('estArrivalAirport'):
-                        flights.append({
-                            'date': datetime.fromtimestamp(flight.get('firstSeen', time.time())).date(),
-                            'departure_city': flight['estDepartureAirport'],
-                            'destination_city': flight['estArrivalAirport'],
-                            'airline': flight.get('callsign', 'Unknown')[:3],
-                            'flight_number': flight.get('callsign', 'Unknown'),
-                            'price': np.random.uniform(200, 800),  # Simulated price
-                            'capacity': np.random.randint(100, 300),
-                            'occupancy': np.random.randint(50, 300),
-                            'route': f"{flight['estDepartureAirport']} → {flight['estArrivalAirport']}"
-                        })
-                
-                return pd.DataFrame(flights)
-        
-        return None
-        
-    except Exception as e:
-        st.warning(f"OpenSky API error: {e}")
-        return None
+    handler = StreamlitLogHandler()
+    core.logger.addHandler(handler)
+    core.logger.setLevel(logging.INFO)
+    core.worker_context_factory = streamlit_worker_context
+    return handler
 
-def fetch_flight_data() -> pd.DataFrame:
+install_core_logging()
+
+@st.cache_resource
+def get_dataset_registry() -> DatasetRegistry:
     """
-    Fetch flight data from available APIs or generate sample data.
+    Return the process-wide dataset registry shared by all sessions.
     
     Returns:
-        DataFrame with flight data
+        DatasetRegistry instance
     """
-    # Try AviationStack API first
-    df = fetch_aviationstack_data()
-    
-    if df is not None and not df.empty:
-        st.success("✅ Data fetched from AviationStack API")
-        return df
-    
-    # Try OpenSky Network API
-    df = fetch_opensky_data()
-    
-    if df is not None and not df.empty:
-        st.success("✅ Data fetched from OpenSky Network API")
-        return df
+    return DatasetRegistry(DATASET_MEMORY_LIMIT_MB * 1024 * 1024, DATA_CACHE_TTL, DATASET_LEASE_SECONDS)
+
+def current_session_id() -> Optional[str]:
+    """
+    Return the id of the Streamlit session running this script, if any.
     
-    # Generate sample data if no APIs available
-    st.info("📊 Using sample data for demonstration (no API keys configured)")
-    sample_df = generate_sample_data()
-    st.success(f"✅ Sample data generated successfully: {len(sample_df)} flights")
-    return sample_df
+    Returns:
+        Session id or None outside a Streamlit session
+    """
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else None
+    except ImportError:
+        return None
 
-def process_data(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+def load_dataset(data_source: str, start_date: date, end_date: date, api_fingerprint: str) -> Tuple[pd.DataFrame, Dict]:
     """
-    Process the flight data to extract insights.
+    Return the processed dataset for a configuration from the shared registry.
+    
+    The flights are fetched and processed once per key and process; every
+    session viewing the same key reads the same immutable frame.
     
     Args:
-        df: Raw flight data DataFrame
+        data_source: Primary data source (part of the dataset key)
+        start_date: First day of the requested window
+        end_date: Last day of the requested window
+        api_fingerprint: Hash of the API configuration (part of the dataset key)
         
     Returns:
         Tuple of (processed DataFrame, insights dictionary)
     """
-    # Make a copy to avoid modifying original
-    processed_df = df.copy()
-    
-    # Convert date to datetime if it's not already
-    if 'date' in processed_df.columns:
-        processed_df['date'] = pd.to_datetime(processed_df['date'])
-    
-    # Calculate additional metrics if required columns exist
-    if 'occupancy' in processed_df.columns and 'capacity' in processed_df.columns:
-        processed_df['occupancy_rate'] = (processed_df['occupancy'] / processed_df['capacity'] * 100).round(2)
+    def build() -> Tuple[Tuple[pd.DataFrame, Dict], int]:
+        dataset = process_data(fetch_flight_data(start_date, end_date))
+        return dataset, dataset_nbytes(dataset)
+    
+    def refresh(dataset: Tuple[pd.DataFrame, Dict]) -> Optional[Tuple[Tuple[pd.DataFrame, Dict], int]]:
+        refreshed = refresh_dataset(dataset, start_date, end_date)
+        if refreshed is None:
+            return None
+        return refreshed, dataset_nbytes(refreshed)
+    
+    key = (data_source, start_date, end_date, api_fingerprint)
+    return get_dataset_registry().get_or_create(key, build, current_session_id(), refresh)
+
+def invalidate_data_cache() -> None:
+    """
+    Drop all shared fetched and processed datasets.
+    """
+    get_dataset_registry().clear()
+
+def chart_point_caption(shown: int, total: int, method: str, unit: str = "points") -> None:
+    """
+    Note under a chart how many of the raw points are displayed.
+    """
+    if shown < total:
+        st.caption(f"Showing {shown:,} of {total:,} {unit} ({method})")
     else:
-        processed_df['occupancy_rate'] = 0
+        st.caption(f"Showing all {total:,} {unit}")
+
+def register_chart_template() -> None:
+    """
+    Register the dashboard's dark Plotly template as CHART_TEMPLATE.
     
-    if 'price' in processed_df.columns and 'occupancy' in processed_df.columns:
-        processed_df['revenue'] = processed_df['price'] * processed_df['occupancy']
-    else:
-        processed_df['revenue'] = 0
+    It extends plotly_dark with the colors, fonts and grid styling every
+    chart used to set through its own update_layout call.
+    """
+    axis = dict(
+        title_font_size=16,
+        tickfont_size=12,
+        showgrid=True,
+        gridcolor='rgba(255,255,255,0.1)',
+        title_font_color='#fafafa',
+        tickfont_color='#c1c1c1'
+    )
+    template = go.layout.Template(pio.templates['plotly_dark'])
+    template.layout.update(
+        title_font_size=20,
+        title_font_color='#fafafa',
+        plot_bgcolor='#1a1c23',
+        paper_bgcolor='#1a1c23',
+        xaxis=axis,
+        yaxis=axis,
+        margin=dict(l=50, r=50, t=80, b=80),
+        height=500
+    )
+    pio.templates[CHART_TEMPLATE] = template
+
+register_chart_template()
+
+class FigureCache:
+    """
+    Built Plotly figures shared by all sessions, keyed by (chart id, data fingerprint).
     
-    # Extract insights
-    insights = {}
+    Figures are never modified after they are built, so reruns with the same
+    aggregate reuse the object instead of rebuilding and re-validating it.
+    st.plotly_chart still serializes the figure on every run; handing it a
+    cached spec dict instead would be slower, as Streamlit re-validates
+    dicts into figures.
+    """
     
-    # Top 5 popular routes
-    if 'route' in processed_df.columns and not processed_df.empty:
-        route_counts = processed_df['route'].value_counts().head(5)
-        insights['popular_routes'] = route_counts.to_dict()
-    else:
-        insights['popular_routes'] = {}
+    def __init__(self, max_figures: int = CHART_CACHE_SIZE):
+        self.max_figures = max_figures
+        self.figures = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
     
-    # Price trends over time
-    if 'date' in processed_df.columns and 'price' in processed_df.columns and not processed_df.empty:
-        daily_avg_price = processed_df.groupby('date')['price'].mean().reset_index()
-        insights['price_trends'] = daily_avg_price
-    else:
-        insights['price_trends'] = pd.DataFrame()
+    def get_or_build(self, key: Tuple[str, str], build: Callable[[], go.Figure]) -> go.Figure:
+        """
+        Return the cached figure for a key, building it on a miss.
+        
+        Args:
+            key: (chart id, data fingerprint)
+            build: Callable returning the figure
+            
+        Returns:
+            The shared figure
+        """
+        with self.lock:
+            fig = self.figures.get(key)
+            if fig is not None:
+                self.figures.move_to_end(key)
+                self.hits += 1
+                return fig
+            self.misses += 1
+        
+        fig = build()
+        with self.lock:
+            self.figures[key] = fig
+            while len(self.figures) > self.max_figures:
+                self.figures.popitem(last=False)
+        return fig
+
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
+    """
+    Return the process-wide figure cache.
     
-    # High-demand periods
-    if 'date' in processed_df.columns and not processed_df.empty:
-        daily_flights = processed_df.groupby('date').size().reset_index(name='flight_count')
-        insights['demand_periods'] = daily_flights
-    else:
-        insights['demand_periods'] = pd.DataFrame()
+    Returns:
+        FigureCache shared by all sessions
+    """
+    return FigureCache()
+
+def frame_fingerprint(frame: pd.DataFrame) -> str:
+    """
+    Hash the contents of a (small, chart-sized) DataFrame.
     
-    # Average prices by route
-    if 'route' in processed_df.columns and 'price' in processed_df.columns and not processed_df.empty:
-        route_prices = processed_df.groupby('route')['price'].mean().sort_values(ascending=False).head(10)
-        insights['route_prices'] = route_prices.to_dict()
-    else:
-        insights['route_prices'] = {}
+    Args:
+        frame: Chart data
+        
+    Returns:
+        Hex digest of the column names and values
+    """
+    digest = hashlib.sha256(repr(list(frame.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+def cached_figure(chart_id: str, data: pd.DataFrame, build: Callable[[], go.Figure]) -> go.Figure:
+    """
+    Return the figure of a chart, rebuilt only when its data changed.
     
-    # Occupancy analysis
-    if 'occupancy_rate' in processed_df.columns:
-        insights['avg_occupancy'] = processed_df['occupancy_rate'].mean()
-    else:
-        insights['avg_occupancy'] = 0
+    Args:
+        chart_id: Name of the chart (part of the cache key)
+        data: Aggregated data the figure is built from
+        build: Callable building the figure from data
+        
+    Returns:
+        Plotly figure
+    """
+    return get_figure_cache().get_or_build((chart_id, frame_fingerprint(data)), build)
+
+def show_figure(fig: go.Figure) -> None:
+    """
+    Display a dashboard figure with its own template rather than Streamlit's theme.
+    """
+    st.plotly_chart(fig, use_container_width=True, theme=None, config=CHART_CONFIG)
+
+def route_bar_figure(routes_df: pd.DataFrame, measure: str, title: str, y_title: str,
+                     color_scale: str, hover: str) -> go.Figure:
+    """
+    Build a bar chart of a measure per route.
     
-    insights['total_flights'] = len(processed_df)
+    Args:
+        routes_df: DataFrame with Route and the measure column
+        measure: Column plotted on the y axis (also drives the color)
+        title: Chart title
+        y_title: Y axis title
+        color_scale: Continuous color scale name
+        hover: Hover template
+        
+    Returns:
+        Plotly figure
+    """
+    fig = px.bar(routes_df, x='Route', y=measure,
+                title=title,
+                color=measure,
+                color_continuous_scale=color_scale,
+                template=CHART_TEMPLATE)
+    fig.update_layout(
+        xaxis=dict(title="Route", tickangle=-45),
+        yaxis=dict(title=y_title),
+        margin=dict(b=100)
+    )
+    fig.update_traces(
+        hovertemplate=hover,
+        marker_line_color='#1a1c23',
+        marker_line_width=2
+    )
+    return fig
+
+def price_trends_figure(price_trends: pd.DataFrame) -> go.Figure:
+    """
+    Build the average price trend line chart.
     
-    if 'revenue' in processed_df.columns:
-        insights['total_revenue'] = processed_df['revenue'].sum()
-    else:
-        insights['total_revenue'] = 0
+    Args:
+        price_trends: DataFrame with date and price columns
+        
+    Returns:
+        Plotly figure
+    """
+    fig = px.line(price_trends, x='date', y='price',
+                 title="Average Price Trends Over Time",
+                 labels={'price': 'Average Price ($)', 'date': 'Date'},
+                 template=CHART_TEMPLATE)
+    fig.update_layout(xaxis=dict(title="Date"), yaxis=dict(title="Average Price ($)"))
+    fig.update_traces(
+        hovertemplate="<b>%{x}</b><br>Price: $%{y:.2f}<extra></extra>",
+        line=dict(width=3, color='#00d4aa'),
+        mode='lines+markers',
+        marker=dict(size=6, color='#667eea')
+    )
+    return fig
+
+def demand_figure(demand: pd.DataFrame, bucket_days: int) -> go.Figure:
+    """
+    Build the flight demand bar chart.
     
-    return processed_df, insights
+    Args:
+        demand: DataFrame with date and flight_count columns
+        bucket_days: Days summed into each bar
+        
+    Returns:
+        Plotly figure
+    """
+    fig = px.bar(demand, x='date', y='flight_count',
+                title="Daily Flight Demand Patterns" if bucket_days == 1 else f"Flight Demand per {bucket_days} Days",
+                labels={'flight_count': 'Number of Flights', 'date': 'Date'},
+                template=CHART_TEMPLATE)
+    fig.update_layout(xaxis=dict(title="Date"), yaxis=dict(title="Number of Flights"))
+    fig.update_traces(
+        hovertemplate="<b>%{x}</b><br>Flights: %{y}<extra></extra>",
+        marker_color='#00d4aa',
+        marker_line_color='#1a1c23',
+        marker_line_width=2
+    )
+    return fig
 
-def create_charts(df: pd.DataFrame, insights: Dict) -> None:
+def create_charts(df: pd.DataFrame, insights: Dict, max_points: Optional[Dict[str, int]] = None) -> None:
     """
     Create and display interactive charts using Plotly with professional styling.
     
+    Series are reduced before figures are built, so the browser payload
+    stays bounded however long the history is: time series are LTTB
+    downsampled or summed into multi-day buckets and route bars show the
+    top routes plus an "Other" bar.
+    
     Args:
         df: Processed flight data DataFrame
         insights: Dictionary containing processed insights
+        max_points: Per-chart caps overriding CHART_MAX_POINTS
     """
+    limits = {**CHART_MAX_POINTS, **(max_points or {})}
+    route_totals = insights.get('route_totals')
+    
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     st.subheader("📊 Interactive Charts & Analytics")
     st.markdown("</div>", unsafe_allow_html=True)
     
     # Create tabs for different chart types
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🚀 Popular Routes", "💰 Price Trends", "📈 Demand Patterns", "🛫 Route Analysis", "🎯 Market Overview"])
+    tab1, tab2, tab3, tab4, tab5 = lazy_tabs(["🚀 Popular Routes", "💰 Price Trends", "📈 Demand Patterns", "🛫 Route Analysis", "🎯 Market Overview"], key="chart_tabs")
     
     with tab1:
-        # Popular routes chart with improved styling
-        if 'popular_routes' in insights and insights['popular_routes']:
-            routes_df = pd.DataFrame(list(insights['popular_routes'].items()), 
-                                   columns=['Route', 'Flight Count'])
-            
-            fig = px.bar(routes_df, x='Route', y='Flight Count',
-                        title="Top 5 Most Popular Routes",
-                        color='Flight Count',
-                        color_continuous_scale='viridis',
-                        template='plotly_dark')
-            
-            # Enhanced chart styling with dark theme
-            fig.update_layout(
-                title_font_size=20,
-                title_font_color='#fafafa',
-                plot_bgcolor='#1a1c23',
-                paper_bgcolor='#1a1c23',
-                xaxis=dict(
-                    title="Route",
-                    title_font_size=16,
-                    tickfont_size=12,
-                    tickangle=-45,
-                    showgrid=True,
-                    gridcolor='rgba(255,255,255,0.1)',
-                    title_font_color='#fafafa',
-                    tickfont_color='#c1c1c1'
-                ),
-                yaxis=dict(
-                    title="Number of Flights",
-                    title_font_size=16,
-                    tickfont_size=12,
-                    showgrid=True,
-                    gridcolor='rgba(255,255,255,0.1)',
-                    title_font_color='#fafafa',
-                    tickfont_color='#c1c1c1'
-                ),
-                margin=dict(l=50, r=50, t=80, b=100),
-                height=500
-            )
-            
-            # Add hover template
-            fig.update_traces(
-                hovertemplate="<b>%{x}</b><br>Flights: %{y}<extra></extra>",
-                marker_line_color='white',
-                marker_line_width=2
-            )
-            
-            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True, 'displaylogo': False})
-        else:
-            st.info("📊 No route data available for visualization.")
+        if tab_open(tab1):
+            # Popular routes chart with improved styling
+            if 'popular_routes' in insights and insights['popular_routes']:
+                if route_totals is not None and not route_totals.empty:
+                    # A count chart shows the top routes only; an "Other" bar would dwarf them
+                    ranked = route_totals.sort_values('flights', ascending=False, kind='stable')
+                    routes_df = pd.DataFrame({'Route': ranked['route'].astype(str).head(limits['popular_routes']),
+                                              'Flight Count': ranked['flights'].head(limits['popular_routes'])})
+                else:
+                    routes_df = pd.DataFrame(list(insights['popular_routes'].items()), 
+                                           columns=['Route', 'Flight Count'])
+                
+                fig = cached_figure('popular_routes', routes_df, lambda: route_bar_figure(
+                    routes_df, 'Flight Count', f"Top {limits['popular_routes']} Most Popular Routes",
+                    "Number of Flights", 'viridis', "<b>%{x}</b><br>Flights: %{y}<extra></extra>"))
+                show_figure(fig)
+                if route_totals is not None and len(route_totals) > limits['popular_routes']:
+                    rest = ranked.iloc[limits['popular_routes']:]
+                    st.caption(f"Showing the top {limits['popular_routes']} of {len(route_totals):,} routes; "
+                               f"the other {len(rest):,} routes have {int(rest['flights'].sum()):,} flights")
+                elif route_totals is not None:
+                    chart_point_caption(len(route_totals), len(route_totals), '', 'routes')
+            else:
+                st.info("📊 No route data available for visualization.")
     
     with tab2:
-        # Price trends chart with improved styling
-        if 'price_trends' in insights and not insights['price_trends'].empty:
-            fig = px.line(insights['price_trends'], x='date', y='price',
-                         title="Average Price Trends Over Time",
-                         labels={'price': 'Average Price ($)', 'date': 'Date'},
-                         template='plotly_dark')
-            
-            # Enhanced chart styling with dark theme
-            fig.update_layout(
-                title_font_size=20,
-                title_font_color='#fafafa',
-                plot_bgcolor='#1a1c23',
-                paper_bgcolor='#1a1c23',
-                xaxis=dict(
-                    title="Date",
-                    title_font_size=16,
-                    tickfont_size=12,
-                    showgrid=True,
-                    gridcolor='rgba(255,255,255,0.1)',
-                    title_font_color='#fafafa',
-                    tickfont_color='#c1c1c1'
-                ),
-                yaxis=dict(
-                    title="Average Price ($)",
-                    title_font_size=16,
-                    tickfont_size=12,
-                    showgrid=True,
-                    gridcolor='rgba(255,255,255,0.1)',
-                    title_font_color='#fafafa',
-                    tickfont_color='#c1c1c1'
-                ),
-                margin=dict(l=50, r=50, t=80, b=80),
-                height=500
-            )
-            
-            # Add hover template and line styling with dark theme colors
-            fig.update_traces(
-                hovertemplate="<b>%{x}</b><br>Price: $%{y:.2f}<extra></extra>",
-                line=dict(width=3, color='#00d4aa'),
-                mode='lines+markers',
-                marker=dict(size=6, color='#667eea')
-            )
-            
-            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True, 'displaylogo': False})
-        else:
-            st.info("💰 No price trend data available for visualization.")
+        if tab_open(tab2):
+            # Price trends chart with improved styling
+            if 'price_trends' in insights and not insights['price_trends'].empty:
+                price_trends = downsample_series(insights['price_trends'], 'date', 'price', limits['price_trends'])
+                fig = cached_figure('price_trends', price_trends, lambda: price_trends_figure(price_trends))
+                show_figure(fig)
+                chart_point_caption(len(price_trends), len(insights['price_trends']), 'LTTB downsampled')
+            else:
+                st.info("💰 No price trend data available for visualization.")
     
     with tab3:
-        # Demand patterns chart with improved styling
-        if 'demand_periods' in insights and not insights['demand_periods'].empty:
-            fig = px.bar(insights['demand_periods'], x='date', y='flight_count',
-                        title="Daily Flight Demand Patterns",
-                        labels={'flight_count': 'Number of Flights', 'date': 'Date'},
-                        template='plotly_dark')
-            
-            # Enhanced chart styling with dark theme
-            fig.update_layout(
-                title_font_size=20,
-                title_font_color='#fafafa',
-                plot_bgcolor='#1a1c23',
-                paper_bgcolor='#1a1c23',
-                xaxis=dict(
-                    title="Date",
-                    title_font_size=16,
-                    tickfont_size=12,
-                    showgrid=True,
-                    gridcolor='rgba(255,255,255,0.1)',
-                    title_font_color='#fafafa',
-                    tickfont_color='#c1c1c1'
-                ),
-                yaxis=dict(
-                    title="Number of Flights",
-                    title_font_size=16,
-                    tickfont_size=12,
-                    showgrid=True,
-                    gridcolor='rgba(255,255,255,0.1)',
-                    title_font_color='#fafafa',
-                    tickfont_color='#c1c1c1'
-                ),
-                margin=dict(l=50, r=50, t=80, b=80),
-                height=500
-            )
-            
-            # Add hover template and bar styling with dark theme colors
-            fig.update_traces(
-                hovertemplate="<b>%{x}</b><br>Flights: %{y}<extra></extra>",
-                marker_color='#00d4aa',
-                marker_line_color='#1a1c23',
-                marker_line_width=2
-            )
-            
-            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True, 'displaylogo': False})
-        else:
-            st.info("📈 No demand pattern data available for visualization.")
+        if tab_open(tab3):
+            # Demand patterns chart with improved styling
+            if 'demand_periods' in insights and not insights['demand_periods'].empty:
+                demand, bucket_days = bucket_series(insights['demand_periods'], 'date', 'flight_count', limits['demand_periods'])
+                fig = cached_figure('demand_periods', demand, lambda: demand_figure(demand, bucket_days))
+                show_figure(fig)
+                chart_point_caption(len(demand), len(insights['demand_periods']), f"summed into {bucket_days}-day buckets", 'days')
+            else:
+                st.info("📈 No demand pattern data available for visualization.")
     
     with tab4:
-        # Route price analysis with improved styling
-        if 'route_prices' in insights and insights['route_prices']:
-            route_prices_df = pd.DataFrame(list(insights['route_prices'].items()),
-                                         columns=['Route', 'Average Price'])
-            route_prices_df = route_prices_df.head(10)
+        if tab_open(tab4):
+            # Route price analysis with improved styling
+            if 'route_prices' in insights and insights['route_prices']:
+                if route_totals is not None and not route_totals.empty:
+                    route_prices_df = top_routes_with_other(route_totals, 'price_mean', limits['route_prices'])
+                    route_prices_df = route_prices_df.rename(columns={'price_mean': 'Average Price'})
+                else:
+                    route_prices_df = pd.DataFrame(list(insights['route_prices'].items()),
+                                                 columns=['Route', 'Average Price'])
+                    route_prices_df = route_prices_df.head(limits['route_prices'])
+                
+                fig = cached_figure('route_prices', route_prices_df, lambda: route_bar_figure(
+                    route_prices_df, 'Average Price', f"Average Prices by Route (Top {limits['route_prices']})",
+                    "Average Price ($)", 'plasma', "<b>%{x}</b><br>Price: $%{y:.2f}<extra></extra>"))
+                show_figure(fig)
+                if route_totals is not None:
+                    chart_point_caption(min(len(route_totals), limits['route_prices']), len(route_totals), 'the rest grouped as Other', 'routes')
+            else:
+                st.info("🛫 No route price data available for visualization.")
+    
+    with tab5:
+        if tab_open(tab5):
+            # Market overview dashboard
+            st.subheader("🎯 Market Overview Dashboard")
             
-            fig = px.bar(route_prices_df, x='Route', y='Average Price',
-                        title="Average Prices by Route (Top 10)",
-                        color='Average Price',
-                        color_continuous_scale='plasma',
-                        template='plotly_dark')
+            # Create a summary grid
+            col1, col2 = st.columns(2)
             
-            # Enhanced chart styling with dark theme
-            fig.update_layout(
-                title_font_size=20,
-                title_font_color='#fafafa',
-                plot_bgcolor='#1a1c23',
-                paper_bgcolor='#1a1c23',
-                xaxis=dict(
-                    title="Route",
-                    title_font_size=16,
-                    tickfont_size=12,
-                    tickangle=-45,
-                    showgrid=True,
-                    gridcolor='rgba(255,255,255,0.1)',
-                    title_font_color='#fafafa',
-                    tickfont_color='#c1c1c1'
-                ),
-                yaxis=dict(
-                    title="Average Price ($)",
-                    title_font_size=16,
-                    tickfont_size=12,
-                    showgrid=True,
-                    gridcolor='rgba(255,255,255,0.1)',
-                    title_font_color='#fafafa',
-                    tickfont_color='#c1c1c1'
-                ),
-                margin=dict(l=50, r=50, t=80, b=100),
-                height=500
-            )
+            with col1:
+                if 'avg_occupancy' in insights:
+                    st.metric(
+                        label="Average Occupancy Rate",
+                        value=f"{insights['avg_occupancy']:.1f}%",
+                        delta=f"{insights['avg_occupancy'] - 70:.1f}%" if insights['avg_occupancy'] > 70 else f"{insights['avg_occupancy'] - 70:.1f}%"
+                    )
+                
+                if 'total_revenue' in insights:
+                    st.metric(
+                        label="Total Revenue",
+                        value=f"${insights['total_revenue']:,.0f}",
+                        delta=f"${insights['total_revenue'] * 0.1:,.0f}"
+                    )
             
-            # Add hover template with dark theme colors
-            fig.update_traces(
-                hovertemplate="<b>%{x}</b><br>Price: $%{y:.2f}<extra></extra>",
-                marker_line_color='#1a1c23',
-                marker_line_width=2
-            )
+            with col2:
+                if 'total_flights' in insights:
+                    st.metric(
+                        label="Total Flights",
+                        value=f"{insights['total_flights']:,}",
+                        delta=f"{insights['total_flights'] * 0.05:.0f}"
+                    )
+                
+                if 'route_prices' in insights and insights['route_prices']:
+                    avg_price = np.mean(list(insights['route_prices'].values()))
+                    st.metric(
+                        label="Average Route Price",
+                        value=f"${avg_price:.0f}",
+                        delta=f"${avg_price * 0.05:.0f}"
+                    )
             
-            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True, 'displaylogo': False})
-        else:
-            st.info("🛫 No route price data available for visualization.")
+            # Additional insights
+            if 'popular_routes' in insights and insights['popular_routes']:
+                st.subheader("🏆 Top Performing Routes")
+                top_routes = pd.DataFrame(list(insights['popular_routes'].items())[:3], 
+                                        columns=['Route', 'Flight Count'])
+                st.dataframe(top_routes, use_container_width=True, hide_index=True)
+
+def sort_positions(values: pd.Series, ascending: bool = True) -> np.ndarray:
+    """
+    Return the positions that sort a column (stable, missing values last).
     
-    with tab5:
-        # Market overview dashboard
-        st.subheader("🎯 Market Overview Dashboard")
-        
-        # Create a summary grid
-        col1, col2 = st.columns(2)
+    Categorical columns sort alphabetically by label, not in the order in
+    which their categories happened to be created.
+    """
+    values = values.reset_index(drop=True)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        rank = np.argsort(np.argsort(categories.astype(str), kind='stable'), kind='stable')
+        codes = values.cat.codes.to_numpy()
+        values = pd.Series(np.where(codes >= 0, rank[codes], np.nan))
+    return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+@st.cache_resource(max_entries=TABLE_SORT_CACHE_SIZE, show_spinner=False)
+def table_sort_order(_df: pd.DataFrame, export_key: str, column: str, ascending: bool) -> np.ndarray:
+    """
+    Return the row positions of a frame sorted by one column.
+    
+    Cached per export fingerprint, so paging through a sorted table sorts
+    the filtered flights only once.
+    
+    Args:
+        _df: Filtered flight data (identified by export_key, not hashed)
+        export_key: Fingerprint of the dataset and filters (see export_fingerprint)
+        column: Column to sort by
+        ascending: Sort direction
         
-        with col1:
-            if 'avg_occupancy' in insights:
-                st.metric(
-                    label="Average Occupancy Rate",
-                    value=f"{insights['avg_occupancy']:.1f}%",
-                    delta=f"{insights['avg_occupancy'] - 70:.1f}%" if insights['avg_occupancy'] > 70 else f"{insights['avg_occupancy'] - 70:.1f}%"
-                )
-            
-            if 'total_revenue' in insights:
-                st.metric(
-                    label="Total Revenue",
-                    value=f"${insights['total_revenue']:,.0f}",
-                    delta=f"${insights['total_revenue'] * 0.1:,.0f}"
-                )
+    Returns:
+        Array of row positions in sorted order (missing values last)
+    """
+    return sort_positions(_df[column], ascending)
+
+@st.cache_resource(max_entries=TABLE_SORT_CACHE_SIZE, show_spinner=False)
+def cached_frame_nbytes(_df: pd.DataFrame, export_key: str) -> int:
+    """
+    Return the memory held by a frame, including its strings.
+    
+    Measuring strings scans every value, so the result is cached per
+    export fingerprint instead of recomputed on every page change.
+    
+    Args:
+        _df: Filtered flight data (identified by export_key, not hashed)
+        export_key: Fingerprint of the dataset and filters (see export_fingerprint)
         
-        with col2:
-            if 'total_flights' in insights:
-                st.metric(
-                    label="Total Flights",
-                    value=f"{insights['total_flights']:,}",
-                    delta=f"{insights['total_flights'] * 0.05:.0f}"
-                )
-            
-            if 'route_prices' in insights and insights['route_prices']:
-                avg_price = np.mean(list(insights['route_prices'].values()))
-                st.metric(
-                    label="Average Route Price",
-                    value=f"${avg_price:.0f}",
-                    delta=f"${avg_price * 0.05:.0f}"
-                )
+    Returns:
+        Size in bytes
+    """
+    return int(_df.memory_usage(deep=True).sum())
+
+def table_page(df: pd.DataFrame, page: int, page_size: int, sort_column: Optional[str] = None,
+               ascending: bool = True, export_key: str = "") -> pd.DataFrame:
+    """
+    Slice one page of rows out of a frame, sorting on the server.
+    
+    Args:
+        df: Flight data
+        page: Zero-based page number
+        page_size: Rows per page
+        sort_column: Column to sort by (None keeps the date order of the data)
+        ascending: Sort direction
+        export_key: Fingerprint of df used to cache the sort order (empty
+            disables caching)
         
-        # Additional insights
-        if 'popular_routes' in insights and insights['popular_routes']:
-            st.subheader("🏆 Top Performing Routes")
-            top_routes = pd.DataFrame(list(insights['popular_routes'].items())[:3], 
-                                    columns=['Route', 'Flight Count'])
-            st.dataframe(top_routes, use_container_width=True, hide_index=True)
+    Returns:
+        DataFrame with at most page_size rows
+    """
+    offset = page * page_size
+    if sort_column is None:
+        return df.iloc[offset:offset + page_size]
+    if export_key:
+        order = table_sort_order(df, export_key, sort_column, ascending)
+    else:
+        order = sort_positions(df[sort_column], ascending)
+    return df.iloc[order[offset:offset + page_size]]
 
-def display_tables(df: pd.DataFrame, insights: Dict) -> None:
+def format_bytes(size: float) -> str:
+    """
+    Format a byte count with a binary unit (e.g. 12.3 KB).
+    """
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+def display_tables(df: pd.DataFrame, insights: Dict, cube: pd.DataFrame, export_key: str = "") -> None:
     """
     Display data tables with enhanced styling.
     
+    Summary tables and metrics are answered from the aggregate cube; only
+    the raw data tab and file exports touch individual flights.
+    
     Args:
         df: Processed flight data DataFrame
         insights: Dictionary containing processed insights
+        cube: Aggregate cube of the flights in df
+        export_key: Fingerprint of the dataset and filters behind df (see
+            export_fingerprint); prepared exports are reused while it matches
     """
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     st.subheader("📋 Data Tables & Export")
     st.markdown("</div>", unsafe_allow_html=True)
     
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Raw Data", "🛫 Route Summary", "📅 Daily Summary", "📈 Performance Metrics"])
+    tab1, tab2, tab3, tab4 = lazy_tabs(["📊 Raw Data", "🛫 Route Summary", "📅 Daily Summary", "📈 Performance Metrics"], key="table_tabs")
     
     with tab1:
-        if not df.empty:
-            st.markdown("**📊 Raw Flight Data**")
-            st.markdown(f"*Showing {len(df)} records*")
-            
-            # Enhanced dataframe with better styling
-            st.dataframe(
-                df,
-                use_container_width=True,
-                hide_index=True,
-                column_config={
-                    "date": st.column_config.DateColumn("Date", format="DD/MM/YYYY"),
-                    "price": st.column_config.NumberColumn("Price ($)", format="$%.2f"),
-                    "occupancy_rate": st.column_config.NumberColumn("Occupancy (%)", format="%.1f%%"),
-                    "revenue": st.column_config.NumberColumn("Revenue ($)", format="$%.2f")
-                }
-            )
-            
-            # Enhanced download section
-            col1, col2 = st.columns(2)
-            with col1:
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    label="📥 Download CSV",
-                    data=csv,
-                    file_name=f"airline_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
-            
-            with col2:
-                # Excel export (if openpyxl is available)
-                try:
-                    import openpyxl
-                    from io import BytesIO
-                    
-                    buffer = BytesIO()
-                    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                        df.to_excel(writer, sheet_name='Flight Data', index=False)
-                        # Add summary sheet
-                        if 'route' in df.columns:
-                            route_summary = df.groupby('route').agg({
-                                'price': ['mean', 'min', 'max'],
-                                'occupancy_rate': 'mean',
-                                'flight_number': 'count'
-                            }).round(2)
-                            route_summary.to_excel(writer, sheet_name='Route Summary')
-                    
-                    buffer.seek(0)
-                    st.download_button(
-                        label="📊 Download Excel",
-                        data=buffer.getvalue(),
-                        file_name=f"airline_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
+        if tab_open(tab1):
+            if not df.empty:
+                raw_data_table(df, export_key)
+                
+                # Enhanced download section (files are built in the background on request)
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    data_format = st.radio(
+                        "Data format",
+                        DATA_EXPORT_FORMATS,
+                        format_func=lambda name: EXPORT_FORMATS[name][0],
+                        horizontal=True,
+                        key="raw_data_format",
+                        label_visibility="collapsed"
                     )
-                except ImportError:
-                    st.info("💡 Install openpyxl for Excel export: `pip install openpyxl`")
-        else:
-            st.info("📊 No data available to display.")
-    
-    with tab2:
-        # Enhanced route summary table
-        if 'route' in df.columns and not df.empty:
-            try:
-                st.markdown("**🛫 Route Performance Summary**")
                 
-                agg_dict = {}
-                if 'price' in df.columns:
-                    agg_dict['price'] = ['mean', 'min', 'max']
-                if 'occupancy_rate' in df.columns:
-                    agg_dict['occupancy_rate'] = 'mean'
-                if 'flight_number' in df.columns:
-                    agg_dict['flight_number'] = 'count'
-                if 'revenue' in df.columns:
-                    agg_dict['revenue'] = 'sum'
+                with col2:
+                    export_panel(df, insights, export_key, data_format, f"table_{data_format}")
                 
-                if agg_dict:
-                    route_summary = df.groupby('route').agg(agg_dict).round(2)
-                    # Flatten column names
-                    route_summary.columns = ['_'.join(col).strip() if isinstance(col, tuple) else col for col in route_summary.columns]
-                    route_summary = route_summary.sort_values('flight_number_count' if 'flight_number_count' in route_summary.columns else route_summary.columns[0], ascending=False)
+                with col3:
+                    export_panel(df, insights, export_key, "excel", "table_excel")
+            else:
+                st.info("📊 No data available to display.")
+    
+    with tab2:
+        if tab_open(tab2):
+            # Enhanced route summary table
+            if 'route' in cube.columns and not cube.empty:
+                try:
+                    st.markdown("**🛫 Route Performance Summary**")
+                    
+                    route_summary = route_summary_from_cube(cube)
                     
                     # Add performance indicators
-                    if 'price_mean' in route_summary.columns and 'occupancy_rate_mean' in route_summary.columns:
-                        route_summary['performance_score'] = (
-                            (route_summary['price_mean'] / route_summary['price_mean'].max()) * 0.4 +
-                            (route_summary['occupancy_rate_mean'] / 100) * 0.6
-                        ).round(3)
+                    route_summary['performance_score'] = (
+                        (route_summary['price_mean'] / route_summary['price_mean'].max()) * 0.4 +
+                        (route_summary['occupancy_rate_mean'] / 100) * 0.6
+                    ).round(3)
                     
                     st.dataframe(route_summary, use_container_width=True, hide_index=True)
-                else:
-                    st.info("📊 No data available for route summary.")
-            except Exception as e:
-                st.error(f"❌ Unable to generate route summary: {str(e)}")
-        else:
-            st.info("🛫 No route data available for summary.")
+                except Exception as e:
+                    st.error(f"❌ Unable to generate route summary: {str(e)}")
+            else:
+                st.info("🛫 No route data available for summary.")
     
     with tab3:
-        # Enhanced daily summary table
-        if 'date' in df.columns and not df.empty:
-            try:
-                st.markdown("**📅 Daily Performance Summary**")
-                
-                agg_dict = {}
-                if 'price' in df.columns:
-                    agg_dict['price'] = 'mean'
-                if 'occupancy_rate' in df.columns:
-                    agg_dict['occupancy_rate'] = 'mean'
-                if 'flight_number' in df.columns:
-                    agg_dict['flight_number'] = 'count'
-                if 'revenue' in df.columns:
-                    agg_dict['revenue'] = 'sum'
-                
-                if agg_dict:
-                    daily_summary = df.groupby('date').agg(agg_dict).round(2)
+        if tab_open(tab3):
+            # Enhanced daily summary table
+            if 'date' in cube.columns and not cube.empty:
+                try:
+                    st.markdown("**📅 Daily Performance Summary**")
+                    
+                    daily = rollup_cube(cube, ['date'])
+                    daily_summary = pd.DataFrame({
+                        'date': daily['date'],
+                        'price': daily['price_mean'],
+                        'occupancy_rate': daily['occupancy_rate_mean'],
+                        'flight_number': daily['flights'].astype(int),
+                        'revenue': daily['revenue']
+                    }).round({'price': 2, 'occupancy_rate': 2, 'revenue': 2})
                     
                     # Add day of week for better analysis
-                    daily_summary['day_of_week'] = daily_summary.index.day_name()
-                    daily_summary['weekend'] = daily_summary.index.weekday >= 5
+                    daily_summary['day_of_week'] = daily_summary['date'].dt.day_name()
+                    daily_summary['weekend'] = daily_summary['date'].dt.weekday >= 5
                     
                     st.dataframe(daily_summary, use_container_width=True, hide_index=True)
-                else:
-                    st.info("📅 No data available for daily summary.")
-            except Exception as e:
-                st.error(f"❌ Unable to generate daily summary: {str(e)}")
-        else:
-            st.info("📅 No date data available for daily summary.")
+                except Exception as e:
+                    st.error(f"❌ Unable to generate daily summary: {str(e)}")
+            else:
+                st.info("📅 No date data available for daily summary.")
     
     with tab4:
-        # Performance metrics dashboard
-        st.markdown("**📈 Performance Metrics Dashboard**")
-        
-        if not df.empty:
-            col1, col2 = st.columns(2)
+        if tab_open(tab4):
+            # Performance metrics dashboard
+            st.markdown("**📈 Performance Metrics Dashboard**")
             
-            with col1:
-                if 'price' in df.columns:
-                    st.metric("💰 Price Performance", 
-                             f"${df['price'].mean():.2f}",
-                             f"{df['price'].std():.2f}")
+            if not cube.empty:
+                totals = rollup_cube(cube, []).iloc[0]
+                col1, col2 = st.columns(2)
                 
-                if 'occupancy_rate' in df.columns:
+                with col1:
+                    st.metric("💰 Price Performance", 
+                             f"${totals['price_mean']:.2f}",
+                             f"{totals['price_std']:.2f}")
+                    
                     st.metric("👥 Occupancy Performance",
-                             f"{df['occupancy_rate'].mean():.1f}%",
-                             f"{df['occupancy_rate'].std():.1f}%")
-            
-            with col2:
-                if 'revenue' in df.columns:
-                    st.metric("💵 Revenue Performance",
-                             f"${df['revenue'].sum():,.0f}",
-                             f"${df['revenue'].mean():.0f}/flight")
+                             f"{totals['occupancy_rate_mean']:.1f}%",
+                             f"{totals['occupancy_rate_std']:.1f}%")
                 
-                if 'route' in df.columns:
-                    st.metric("🛫 Route Diversity",
-                             f"{df['route'].nunique()}",
-                             f"{df['airline'].nunique()} airlines")
-            
-            # Performance trends
-            if 'date' in df.columns and len(df) > 1:
-                st.markdown("**📊 Performance Trends**")
+                with col2:
+                    st.metric("💵 Revenue Performance",
+                             f"${totals['revenue']:,.0f}",
+                             f"${totals['revenue'] / totals['flights']:.0f}/flight")
+                    
+                    if 'route' in cube.columns:
+                        st.metric("🛫 Route Diversity",
+                                 f"{cube['route'].nunique()}",
+                                 f"{cube['airline'].nunique()} airlines")
                 
-                # Calculate trends
-                if 'price' in df.columns:
-                    price_trend = df.groupby('date')['price'].mean()
+                # Performance trends
+                if 'date' in cube.columns and totals['flights'] > 1:
+                    st.markdown("**📊 Performance Trends**")
+                    
+                    # Calculate trends
+                    price_trend = rollup_cube(cube, ['date'])['price_mean']
                     if len(price_trend) > 1:
                         price_change = (price_trend.iloc[-1] - price_trend.iloc[0]) / price_trend.iloc[0] * 100
                         if price_change > 0:
@@ -1133,299 +1071,317 @@ def display_tables(df: pd.DataFrame, insights: Dict) -> None:
                             st.error(f"📉 Average price decreased by {abs(price_change):.1f}%")
                         else:
                             st.info("➡️ Average price remained stable")
-        else:
-            st.info("📈 No data available for performance metrics.")
+            else:
+                st.info("📈 No data available for performance metrics.")
 
-def generate_insights(insights: Dict) -> str:
+@st.cache_resource
+def get_export_jobs() -> ExportJobs:
     """
-    Generate natural language insights from the data.
+    Return the process-wide background export queue.
+    
+    Returns:
+        ExportJobs shared by all sessions
+    """
+    return ExportJobs()
+
+@st.cache_resource
+def get_backfill_jobs() -> ExportJobs:
+    """
+    Return the process-wide queue of OpenSky backfills (one runs at a time).
+    
+    Returns:
+        ExportJobs keyed by (start date, end date)
+    """
+    return ExportJobs(workers=1, name='backfill')
+
+@st.cache_resource
+def get_insight_jobs() -> ExportJobs:
+    """
+    Return the process-wide queue of AI insight requests.
+    
+    Returns:
+        ExportJobs keyed by (insight cache key, provider name)
+    """
+    return ExportJobs(workers=1, name='insights')
+
+def fragment(func: Optional[Callable] = None, *, run_every: Optional[float] = None) -> Callable:
+    """
+    Run a UI function as a Streamlit fragment where supported.
+    
+    Fragments rerun on their own, so widgets inside them do not rerun the
+    whole script; with run_every Streamlit also reruns the fragment on a
+    timer while it is shown (older Streamlit versions run it inline).
+    Usable as @fragment or @fragment(run_every=...).
+    """
+    if func is None:
+        return lambda inner: fragment(inner, run_every=run_every)
+    return st.fragment(func, run_every=run_every) if hasattr(st, 'fragment') else func
+
+def lazy_tabs(labels: List[str], key: str) -> List:
+    """
+    Create tabs whose hidden panels can skip their work.
+    
+    Where Streamlit tracks the selected tab, switching tabs reruns the
+    script and only the open tab reports itself as open (see tab_open);
+    older versions fall back to ordinary tabs that all render.
     
     Args:
-        insights: Dictionary containing processed insights
+        labels: Tab labels
+        key: Widget key remembering the selected tab
         
     Returns:
-        String with natural language insights
-    """
-    insight_text = []
-    
-    # Popular routes
-    if 'popular_routes' in insights and insights['popular_routes']:
-        try:
-            top_route = list(insights['popular_routes'].keys())[0]
-            top_count = list(insights['popular_routes'].values())[0]
-            insight_text.append(f"🎯 **Most Popular Route**: {top_route} with {top_count} flights")
-        except (IndexError, KeyError):
-            insight_text.append("🎯 **Popular Routes**: No route data available")
-    else:
-        insight_text.append("🎯 **Popular Routes**: No route data available")
+        List of tab containers
+    """
+    if 'on_change' in inspect.signature(st.tabs).parameters:
+        return st.tabs(labels, key=key, on_change="rerun")
+    return st.tabs(labels)
+
+def tab_open(tab) -> bool:
+    """
+    Whether a tab from lazy_tabs is selected and its content should be built.
+    """
+    return getattr(tab, 'open', None) is not False
+
+@fragment(run_every=EXPORT_POLL_SECONDS)
+def job_progress(jobs: ExportJobs, job_key: Tuple, text: str, widget_key: str,
+                 timeout: Optional[float] = None, bar: bool = True) -> None:
+    """
+    Show the progress of a background job, polling it on a timer.
     
-    # Price analysis
-    if 'route_prices' in insights and insights['route_prices']:
-        try:
-            avg_price = np.mean(list(insights['route_prices'].values()))
-            insight_text.append(f"💰 **Average Route Price**: ${avg_price:.2f}")
-        except (ValueError, TypeError):
-            insight_text.append("💰 **Average Route Price**: No price data available")
-    else:
-        insight_text.append("💰 **Average Route Price**: No price data available")
-    
-    # Demand analysis
-    if 'demand_periods' in insights and not insights['demand_periods'].empty:
-        try:
-            max_demand_date = insights['demand_periods'].loc[insights['demand_periods']['flight_count'].idxmax(), 'date']
-            max_demand_count = insights['demand_periods']['flight_count'].max()
-            insight_text.append(f"📈 **Peak Demand**: {max_demand_date.strftime('%Y-%m-%d')} with {max_demand_count} flights")
-        except (KeyError, IndexError):
-            insight_text.append("📈 **Peak Demand**: No demand data available")
+    Only this fragment reruns while the job is pending, so nothing else on
+    the page is recomputed. When the job is done the page reruns once so
+    the owning panel can show the result in place of the progress bar.
+    
+    Args:
+        jobs: Queue the job was submitted to
+        job_key: Key of the job
+        text: Progress bar label
+        widget_key: Prefix keeping the widgets of several panels apart
+        timeout: Seconds after the job started at which the panel is
+            rerun to report a timeout (None waits indefinitely)
+        bar: Show a progress bar (False shows text only, for jobs that
+            do not report progress)
+    """
+    job = jobs.get(job_key)
+    if job is None or job['future'].done():
+        st.rerun()
+    if timeout is not None and time.monotonic() - job['started'] > timeout:
+        st.rerun()
+    if bar:
+        st.progress(job['progress'], text=f"{text} {job['progress']:.0%}")
     else:
-        insight_text.append("📈 **Peak Demand**: No demand data available")
+        st.info(text)
+    if not hasattr(st, 'fragment'):
+        # Without fragments there is no timer; let the user poll
+        st.button("🔄 Check progress", key=f"{widget_key}_poll")
+
+@fragment
+def export_panel(df: pd.DataFrame, insights: Dict, export_key: str, format_type: str, widget_key: str) -> None:
+    """
+    Offer an export that is built in the background only when requested.
     
-    # Overall statistics
-    if 'total_flights' in insights:
-        insight_text.append(f"✈️ **Total Flights Analyzed**: {insights.get('total_flights', 0):,}")
+    Reruns never serialize the data: the file is built after the prepare
+    button is clicked, progress is shown while the worker runs and the
+    finished file is reused for as long as the filters stay the same.
     
-    if 'avg_occupancy' in insights and not pd.isna(insights.get('avg_occupancy')):
-        insight_text.append(f"👥 **Average Occupancy Rate**: {insights['avg_occupancy']:.1f}%")
-    else:
-        insight_text.append("👥 **Average Occupancy Rate**: No occupancy data available")
+    Args:
+        df: Filtered flight data to export
+        insights: Insights of the filtered flights
+        export_key: Fingerprint of the dataset and filters (see export_fingerprint)
+        format_type: Key of EXPORT_FORMATS
+        widget_key: Prefix keeping the widgets of several panels apart
+    """
+    jobs = get_export_jobs()
+    job_key = (export_key, format_type)
+    label, extension, mime = EXPORT_FORMATS[format_type]
+    
+    job = jobs.get(job_key)
+    if job is None:
+        if not st.button(f"⚙️ Prepare {label}", key=f"{widget_key}_prepare", use_container_width=True):
+            return
+        job = jobs.submit(job_key, lambda progress: build_report(df, insights, format_type, progress))
+    
+    future = job['future']
+    if not future.done():
+        job_progress(jobs, job_key, f"🔄 Building {label} export...", widget_key)
+        return
     
-    if 'total_revenue' in insights:
-        insight_text.append(f"💵 **Total Revenue**: ${insights.get('total_revenue', 0):,.2f}")
+    error = future.exception()
+    if error is not None:
+        jobs.discard(job_key)
+        if isinstance(error, ImportError):
+            st.info(f"💡 {label} export needs an optional package: {error}")
+        else:
+            st.error(f"❌ Export error: {error}")
+        return
     
-    return "\n\n".join(insight_text)
+    st.download_button(
+        label=f"📥 Download {label}",
+        data=future.result(),
+        file_name=f"airline_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+        mime=mime,
+        key=f"{widget_key}_download",
+        use_container_width=True
+    )
 
-def generate_gemini_insights(insights: Dict, df: pd.DataFrame) -> str:
+@fragment
+def raw_data_table(df: pd.DataFrame, export_key: str = "") -> None:
     """
-    Generate AI-powered insights using Google Gemini API.
+    Show the filtered flights one page at a time.
+    
+    Sorting and slicing happen on the server, so only the visible page is
+    serialized and sent to the browser however many flights match. Paging
+    reruns only this fragment.
     
     Args:
-        insights: Dictionary containing processed insights
-        df: Processed DataFrame with flight data
-        
-    Returns:
-        String with AI-generated insights
+        df: Filtered flight data
+        export_key: Fingerprint of the dataset and filters (see export_fingerprint)
     """
-    try:
-        if not GEMINI_API_KEY:
-            return "🤖 Gemini AI not configured. Please add your API key to use AI-powered insights."
-        
-        # Prepare data summary for Gemini
-        data_summary = {
-            'total_flights': len(df),
-            'date_range': f"{df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}" if 'date' in df.columns else "Unknown",
-            'airlines': df['airline'].nunique() if 'airline' in df.columns else 0,
-            'routes': df['route'].nunique() if 'route' in df.columns else 0,
-            'avg_price': f"${df['price'].mean():.2f}" if 'price' in df.columns else "N/A",
-            'avg_occupancy': f"{df['occupancy_rate'].mean():.1f}%" if 'occupancy_rate' in df.columns else "N/A"
+    col1, col2, col3, col4 = st.columns([1, 2, 1, 1])
+    with col1:
+        page_size = st.selectbox("Rows per page", TABLE_PAGE_SIZES, index=1, key="raw_page_size")
+    with col2:
+        sort_column = st.selectbox("Sort by", [None] + list(df.columns),
+                                   format_func=lambda col: "Date order" if col is None else col,
+                                   key="raw_sort_column")
+    with col3:
+        ascending = st.radio("Order", [True, False], format_func=lambda asc: "↑ Asc" if asc else "↓ Desc",
+                             horizontal=True, key="raw_sort_ascending", disabled=sort_column is None)
+    
+    pages = max((len(df) - 1) // page_size + 1, 1)
+    # A narrower filter can leave the remembered page past the end
+    if st.session_state.get("raw_page", 1) > pages:
+        st.session_state["raw_page"] = pages
+    with col4:
+        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key="raw_page")
+    
+    page_df = table_page(df, int(page) - 1, page_size, sort_column, ascending, export_key)
+    first_row = (int(page) - 1) * page_size + 1
+    st.markdown("**📊 Raw Flight Data**")
+    # Without a fingerprint only the page is measured; the total would scan every row each rerun
+    total = f" of {format_bytes(cached_frame_nbytes(df, export_key))}" if export_key else ""
+    st.markdown(
+        f"*Showing rows {first_row:,}–{first_row + len(page_df) - 1:,} of {len(df):,} records · "
+        f"page ≈ {format_bytes(page_df.memory_usage(deep=True).sum())}{total} in memory*"
+    )
+    
+    st.dataframe(
+        page_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "date": st.column_config.DateColumn("Date", format="DD/MM/YYYY"),
+            "price": st.column_config.NumberColumn("Price ($)", format="$%.2f"),
+            "occupancy_rate": st.column_config.NumberColumn("Occupancy (%)", format="%.1f%%"),
+            "revenue": st.column_config.NumberColumn("Revenue ($)", format="$%.2f")
         }
-        
-        prompt = f"""
-        Analyze this airline market data and provide 3-5 key business insights:
-        
-        Data Summary:
-        - Total Flights: {data_summary['total_flights']}
-        - Date Range: {data_summary['date_range']}
-        - Airlines: {data_summary['airlines']}
-        - Routes: {data_summary['routes']}
-        - Average Price: {data_summary['avg_price']}
-        - Average Occupancy: {data_summary['avg_occupancy']}
-        
-        Please provide:
-        1. Market trends and patterns
-        2. Revenue optimization opportunities
-        3. Route performance analysis
-        4. Competitive insights
-        5. Recommendations for airlines
-        
-        Format as bullet points with clear, actionable insights.
-        """
-        
-        # Initialize Gemini
-        import google.generativeai as genai
-        
-        # Configure Gemini API
-        genai.configure(api_key=GEMINI_API_KEY)
-        
-        # Generate response using Gemini
-        model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(prompt)
-        
-        if response.text:
-            return f"🤖 **AI-Powered Insights**\n\n{response.text}"
-        else:
-            return "🤖 **AI Insights**: Unable to generate insights at this time."
-            
-    except ImportError:
-        return "🤖 **AI Insights**: Google Generative AI library not installed. Run: `pip install google-generativeai`"
-    except Exception as e:
-        return f"🤖 **AI Insights**: Error generating insights: {str(e)}"
+    )
 
-def export_report(df: pd.DataFrame, insights: Dict, format_type: str = "csv") -> bytes:
+@fragment
+def gemini_panel(df: pd.DataFrame) -> None:
     """
-    Export flight data and insights in various formats.
+    Show AI insights without blocking the page.
+    
+    The request runs in a background worker; a placeholder (job_progress)
+    polls it on a timer until the answer arrives or INSIGHT_TIMEOUT_SECONDS
+    pass.
     
     Args:
         df: Processed DataFrame with flight data
-        insights: Dictionary containing processed insights
-        format_type: Export format ("csv", "excel", or "pdf")
-        
-    Returns:
-        Bytes object containing the exported file
     """
-    try:
-        if format_type == "csv":
-            # Export filtered data to CSV
-            csv_buffer = io.StringIO()
-            df.to_csv(csv_buffer, index=False)
-            csv_data = csv_buffer.getvalue().encode('utf-8')
-            csv_buffer.close()
-            return csv_data
-            
-        elif format_type == "excel":
-            # Export to Excel with multiple sheets
-            excel_buffer = io.BytesIO()
-            
-            with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                # Main data sheet
-                df.to_excel(writer, sheet_name='Flight Data', index=False)
-                
-                # Insights summary sheet
-                insights_df = pd.DataFrame([
-                    ['Total Flights', insights.get('total_flights', 0)],
-                    ['Average Price', f"${insights.get('avg_price', 0):.2f}"],
-                    ['Average Occupancy', f"{insights.get('avg_occupancy', 0):.1f}%"],
-                    ['Total Revenue', f"${insights.get('total_revenue', 0):,.2f}"],
-                    ['Unique Airlines', insights.get('unique_airlines', 0)],
-                    ['Unique Routes', insights.get('unique_routes', 0)]
-                ], columns=['Metric', 'Value'])
-                insights_df.to_excel(writer, sheet_name='Insights Summary', index=False)
-                
-                # Popular routes sheet
-                if 'popular_routes' in insights and insights['popular_routes']:
-                    routes_df = pd.DataFrame(list(insights['popular_routes'].items()), 
-                                          columns=['Route', 'Flight Count'])
-                    routes_df.to_excel(writer, sheet_name='Popular Routes', index=False)
-                
-                # Price analysis sheet
-                if 'route_prices' in insights and insights['route_prices']:
-                    prices_df = pd.DataFrame(list(insights['route_prices'].items()), 
-                                           columns=['Route', 'Average Price'])
-                    prices_df.to_excel(writer, sheet_name='Route Prices', index=False)
-            
-            excel_buffer.seek(0)
-            return excel_buffer.getvalue()
-            
-        elif format_type == "pdf":
-            # Create a comprehensive PDF report
-            pdf_buffer = io.BytesIO()
-            
-            # Create PDF using reportlab
-            doc = SimpleDocTemplate(pdf_buffer, pagesize=letter)
-            story = []
-            
-            # Title
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=getSampleStyleSheet()['Title'],
-                fontSize=24,
-                spaceAfter=30,
-                alignment=1  # Center alignment
-            )
-            story.append(Paragraph("✈️ Airline Market Demand Analysis Report", title_style))
-            story.append(Spacer(1, 20))
-            
-            # Executive Summary
-            story.append(Paragraph("Executive Summary", getSampleStyleSheet()['Heading1']))
-            story.append(Spacer(1, 12))
-            
-            summary_data = [
-                ['Metric', 'Value'],
-                ['Total Flights', str(insights.get('total_flights', 0))],
-                ['Date Range', f"{df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}" if 'date' in df.columns else "N/A"],
-                ['Average Price', f"${insights.get('avg_price', 0):.2f}"],
-                ['Average Occupancy', f"{insights.get('avg_occupancy', 0):.1f}%"],
-                ['Total Revenue', f"${insights.get('total_revenue', 0):,.2f}"]
-            ]
-            
-            summary_table = Table(summary_data)
-            summary_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 14),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(summary_table)
-            story.append(Spacer(1, 20))
-            
-            # Key Insights
-            story.append(Paragraph("Key Insights", getSampleStyleSheet()['Heading1']))
-            story.append(Spacer(1, 12))
-            
-            if 'popular_routes' in insights and insights['popular_routes']:
-                story.append(Paragraph("Most Popular Routes:", getSampleStyleSheet()['Heading2']))
-                for i, (route, count) in enumerate(list(insights['popular_routes'].items())[:5]):
-                    story.append(Paragraph(f"{i+1}. {route}: {count} flights", getSampleStyleSheet()['Normal']))
-                story.append(Spacer(1, 12))
-            
-            if 'route_prices' in insights and insights['route_prices']:
-                story.append(Paragraph("Route Price Analysis:", getSampleStyleSheet()['Heading2']))
-                avg_price = np.mean(list(insights['route_prices'].values()))
-                story.append(Paragraph(f"Average route price: ${avg_price:.2f}", getSampleStyleSheet()['Normal']))
-                story.append(Spacer(1, 12))
-            
-            # Data Sample
-            story.append(Paragraph("Data Sample (First 10 Records)", getSampleStyleSheet()['Heading1']))
-            story.append(Spacer(1, 12))
-            
-            # Convert DataFrame to table format for PDF
-            sample_df = df.head(10)
-            if not sample_df.empty:
-                # Get column names
-                cols = list(sample_df.columns)
-                table_data = [cols]  # Header row
-                
-                # Add data rows
-                for _, row in sample_df.iterrows():
-                    table_data.append([str(val) for val in row.values])
-                
-                data_table = Table(table_data)
-                data_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('FONTSIZE', (0, 1), (-1, -1), 8)
-                ]))
-                story.append(data_table)
-            
-            # Build PDF
-            doc.build(story)
-            pdf_buffer.seek(0)
-            return pdf_buffer.getvalue()
-            
-        else:
-            raise ValueError(f"Unsupported format: {format_type}")
-            
-    except Exception as e:
-        st.error(f"Export error: {str(e)}")
-        return None
+    if INSIGHT_PROVIDER == 'gemini' and not GEMINI_API_KEY:
+        st.markdown("🤖 Gemini AI not configured. Please add your API key to use AI-powered insights.")
+        return
+    if INSIGHT_PROVIDER not in INSIGHT_PROVIDERS:
+        st.error(f"❌ Unknown INSIGHT_PROVIDER '{INSIGHT_PROVIDER}' (choose from {', '.join(INSIGHT_PROVIDERS)})")
+        return
+    
+    data_summary = gemini_data_summary(df)
+    key = insight_cache_key(data_summary, INSIGHT_PROVIDER)
+    cached = read_cached_insight(key)
+    if cached is not None:
+        st.markdown(f"🤖 **AI-Powered Insights**\n\n{cached}")
+        return
+    
+    jobs = get_insight_jobs()
+    job_key = (key, INSIGHT_PROVIDER)
+    job = jobs.submit(job_key, lambda progress: generate_gemini_insights(data_summary, INSIGHT_PROVIDER))
+    
+    future = job['future']
+    timed_out = not future.done() and time.monotonic() - job['started'] > INSIGHT_TIMEOUT_SECONDS
+    if not future.done() and not timed_out:
+        job_progress(jobs, job_key, "🤖 Generating AI insights... the rest of the page is ready to use.",
+                     "gemini", timeout=INSIGHT_TIMEOUT_SECONDS, bar=False)
+        return
+    
+    # Failures stay memoized so reruns do not hammer the provider until retried
+    error = None if timed_out else future.exception()
+    if timed_out:
+        st.warning(f"⏱️ AI insights did not arrive within {INSIGHT_TIMEOUT_SECONDS:.0f}s.")
+    elif isinstance(error, ImportError):
+        st.markdown("🤖 **AI Insights**: Google Generative AI library not installed. Run: `pip install google-generativeai`")
+    elif error is not None:
+        st.markdown(f"🤖 **AI Insights**: Error generating insights: {str(error)}")
+    else:
+        st.markdown(future.result())
+        return
+    
+    # The click reruns this fragment, which submits the request again
+    st.button("🔄 Retry AI insights", key="gemini_retry", on_click=jobs.discard, args=(job_key,))
+
+@fragment
+def backfill_panel(start_date: date, end_date: date) -> None:
+    """
+    Offer an OpenSky backfill of the selected range that runs in the background.
+    
+    The estimated number of requests and duration must be confirmed first;
+    ranges longer than OPENSKY_BACKFILL_MAX_DAYS are left to the CLI. The
+    worker leaves part of the OpenSky budget to interactive fetches (see
+    backfill_opensky_data) and the datasets are reloaded once it finishes.
+    
+    Args:
+        start_date: First day to backfill
+        end_date: Last day to backfill (inclusive)
+    """
+    jobs = get_backfill_jobs()
+    job_key = (str(start_date), str(end_date))
+    
+    job = jobs.get(job_key)
+    if job is None:
+        if (end_date - start_date).days + 1 > OPENSKY_BACKFILL_MAX_DAYS:
+            st.caption(f"📥 Backfills from the dashboard cover at most {OPENSKY_BACKFILL_MAX_DAYS} days; "
+                       f"use `python cli.py --backfill` for longer ranges.")
+            return
+        slices, seconds = backfill_duration(start_date, end_date)
+        confirmed = st.checkbox(f"Backfill {slices} OpenSky intervals (about {seconds / 60:.0f} min)",
+                                key="backfill_confirm")
+        if not st.button("📥 Backfill OpenSky History", key="backfill_start", disabled=not confirmed,
+                         use_container_width=True):
+            return
+        job = jobs.submit(job_key, lambda progress: backfill_opensky_data(start_date, end_date, progress=progress))
+    
+    future = job['future']
+    if not future.done():
+        job_progress(jobs, job_key, f"🔄 Backfilling OpenSky flights from {start_date} to {end_date}...", "backfill")
+        return
+    
+    backfill_df = future.result() if future.exception() is None else None
+    if not job.get('applied'):
+        # Reload datasets once so they pick up the stored flights
+        job['applied'] = True
+        if backfill_df is not None:
+            invalidate_data_cache()
+    
+    if backfill_df is not None:
+        st.success(f"✅ Stored {len(backfill_df)} OpenSky flights")
+    else:
+        st.warning("⚠️ No OpenSky flights could be fetched for this range")
+    st.button("OK", key="backfill_clear", on_click=jobs.discard, args=(job_key,), use_container_width=True)
 
 def main():
     """
     Main function to run the Streamlit application.
     """
-    # Initialize session state for data persistence
-    if 'df' not in st.session_state:
-        st.session_state.df = None
-    
     # Header
     st.markdown('<h1 class="main-header">✈️ Airline Market Demand Analyzer</h1>', unsafe_allow_html=True)
     
@@ -1464,13 +1420,18 @@ def main():
     # Quick actions
     st.sidebar.markdown("**⚡ Quick Actions**")
     if st.sidebar.button("🔄 Refresh Data", use_container_width=True):
+        invalidate_data_cache()
         st.rerun()
     
+    with st.sidebar:
+        backfill_panel(start_date, end_date)
+    
     # Export functionality (moved to after data processing)
     st.sidebar.markdown("**📊 Export Report**")
     export_format = st.sidebar.selectbox(
         "Export Format",
-        ["CSV", "Excel", "PDF"],
+        list(EXPORT_FORMATS),
+        format_func=lambda name: EXPORT_FORMATS[name][0],
         key="export_format",
         index=0  # Default to CSV
     )
@@ -1488,21 +1449,28 @@ def main():
     # Debug info
     st.sidebar.markdown("---")
     st.sidebar.markdown("**🐛 Debug Info**")
-    if 'df' in st.session_state and st.session_state.df is not None:
-        st.sidebar.info(f"📊 Raw data: {len(st.session_state.df)} flights")
-        if not st.session_state.df.empty:
-            st.sidebar.success("✅ Data loaded successfully")
-        else:
-            st.sidebar.error("❌ Data is empty")
-    else:
-        st.sidebar.warning("⚠️ No data in session state")
     
-    # Fetch data
+    # Fetch and process data (shared by all sessions viewing the same window)
     with st.spinner("🔄 Fetching airline data..."):
-        df = fetch_flight_data()
+        cache_key = (get_data_source(), start_date, end_date, api_config_fingerprint())
+        processed_df, insights = load_dataset(*cache_key)
+        df = processed_df
+    
+    registry_stats = get_dataset_registry().stats()
+    st.sidebar.info(
+        f"🗄️ Shared datasets: {registry_stats['datasets']} "
+        f"({registry_stats['bytes'] / 1024 / 1024:.1f} MB, {registry_stats['sessions']} sessions)"
+    )
     
-    # Store DataFrame in session state for export functionality
-    st.session_state.df = df
+    # Rate limiter metrics (shared by all sessions in this process)
+    for provider in PROVIDER_RATE_LIMITS:
+        limiter_metrics = get_rate_limiter(provider).metrics()
+        if limiter_metrics['requests'] or limiter_metrics['throttled']:
+            st.sidebar.info(
+                f"⏱️ {provider}: {limiter_metrics['requests']} requests, "
+                f"{limiter_metrics['throttled']} throttled, "
+                f"{limiter_metrics['total_wait']}s waiting (max {limiter_metrics['max_wait']}s)"
+            )
     
     # Debug: Show data info
     st.sidebar.info(f"📊 Data loaded: {len(df)} flights")
@@ -1513,14 +1481,17 @@ def main():
     
     # Additional filters (moved here after df is created)
     st.sidebar.markdown("**✈️ Flight Filters**")
+    price_range = None
+    selected_airline = "All"
+    occupancy_range = None
     
     # Price range filter
     if 'price' in df.columns:
-        # Filter out None/NaN values for price calculations
-        price_values = df['price'].dropna()
+        # Bounds come from the cube's per-cell min/max (NaN prices are skipped)
+        price_values = insights['cube']['price_min'].dropna()
         if not price_values.empty:
             min_price = float(price_values.min())
-            max_price = float(price_values.max())
+            max_price = float(insights['cube']['price_max'].max())
         else:
             min_price, max_price = 0, 1000
         
@@ -1539,19 +1510,16 @@ def main():
         all_airlines = ["All"] + sorted(airline_values)
         selected_airline = st.sidebar.selectbox("Airline", all_airlines, key="airline_filter")
     
-    # Process data first to create occupancy_rate column
-    with st.spinner("🔄 Processing data..."):
-        processed_df, insights = process_data(df)
-        st.sidebar.info(f"📊 Processed data: {len(processed_df)} flights, {len(insights)} insights")
+    st.sidebar.info(f"📊 Processed data: {len(processed_df)} flights, {len(insights)} insights")
     
     # Now create filters using the processed data
     # Occupancy filter (now occupancy_rate column exists)
     if 'occupancy_rate' in processed_df.columns:
-        # Filter out None/NaN values for occupancy calculations
-        occupancy_values = processed_df['occupancy_rate'].dropna()
+        # Bounds come from the cube's per-cell min/max (NaN rates are skipped)
+        occupancy_values = insights['cube']['occupancy_rate_min'].dropna()
         if not occupancy_values.empty:
             min_occupancy = float(occupancy_values.min())
-            max_occupancy = float(occupancy_values.max())
+            max_occupancy = float(insights['cube']['occupancy_rate_max'].max())
         else:
             min_occupancy, max_occupancy = 0, 100
         
@@ -1563,35 +1531,22 @@ def main():
             key="occupancy_range"
         )
     
-    # Apply filters with enhanced logic (using processed_df for filtering)
+    # Apply all filters in a single pass (using processed_df for filtering)
     initial_count = len(processed_df)
+    filters = {
+        'departure_city': departure_city,
+        'destination_city': destination_city,
+        'start_date': start_date,
+        'end_date': end_date,
+        'price_range': price_range,
+        'airline': selected_airline,
+        'occupancy_range': occupancy_range
+    }
+    export_key = export_fingerprint(cache_key, insights.get('dataset_id'), filters)
+    processed_df, insights, filter_counts = filtered_view(processed_df, insights, filters)
     
-    if departure_city != "All":
-        processed_df = processed_df[processed_df['departure_city'] == departure_city]
-        st.sidebar.info(f"🔍 Filtered by departure city: {len(processed_df)} flights remaining")
-    
-    if destination_city != "All":
-        processed_df = processed_df[processed_df['destination_city'] == destination_city]
-        st.sidebar.info(f"🔍 Filtered by destination city: {len(processed_df)} flights remaining")
-    
-    # Date filtering
-    if 'date' in processed_df.columns:
-        processed_df['date'] = pd.to_datetime(processed_df['date'])
-        processed_df = processed_df[(processed_df['date'].dt.date >= start_date) & (processed_df['date'].dt.date <= end_date)]
-        st.sidebar.info(f"🔍 Filtered by date range: {len(processed_df)} flights remaining")
-    
-    # Apply additional filters
-    if 'price' in processed_df.columns and 'price_range' in locals():
-        processed_df = processed_df[(processed_df['price'] >= price_range[0]) & (processed_df['price'] <= price_range[1])]
-        st.sidebar.info(f"🔍 Filtered by price range: {len(processed_df)} flights remaining")
-    
-    if 'airline' in processed_df.columns and 'selected_airline' in locals() and selected_airline != "All":
-        processed_df = processed_df[processed_df['airline'] == selected_airline]
-        st.sidebar.info(f"🔍 Filtered by airline: {len(processed_df)} flights remaining")
-    
-    if 'occupancy_rate' in processed_df.columns and 'occupancy_range' in locals():
-        processed_df = processed_df[(processed_df['occupancy_rate'] >= occupancy_range[0]) & (processed_df['occupancy_rate'] <= occupancy_range[1])]
-        st.sidebar.info(f"🔍 Filtered by occupancy: {len(processed_df)} flights remaining")
+    for filter_label, remaining in filter_counts.items():
+        st.sidebar.info(f"🔍 Filtered by {filter_label}: {remaining} flights remaining")
     
     st.sidebar.success(f"✅ Final filtered data: {len(processed_df)} flights (from {initial_count} total)")
     
@@ -1617,44 +1572,8 @@ def main():
     
     # Export functionality (after data processing and filtering)
     if len(processed_df) > 0:
-        if st.sidebar.button("📥 Export Data", use_container_width=True):
-            st.sidebar.info(f"🔍 Debug: processed_df empty: {processed_df.empty}, export_format: {export_format}")
-            if not processed_df.empty and export_format:
-                with st.spinner(f"🔄 Exporting data as {export_format}..."):
-                    try:
-                        # Export the data
-                        export_data = export_report(processed_df, insights, export_format.lower())
-                        
-                        if export_data:
-                            # Create download button
-                            file_extension = {
-                                "CSV": "csv",
-                                "Excel": "xlsx", 
-                                "PDF": "pdf"
-                            }[export_format]
-                            
-                            filename = f"airline_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_extension}"
-                            
-                            st.sidebar.download_button(
-                                label=f"📥 Download {export_format}",
-                                data=export_data,
-                                file_name=filename,
-                                mime={
-                                    "CSV": "text/csv",
-                                    "Excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                    "PDF": "application/pdf"
-                                }[export_format],
-                                use_container_width=True
-                            )
-                            
-                            st.sidebar.success(f"✅ {export_format} export ready for download!")
-                        else:
-                            st.sidebar.error("❌ Export failed. Please try again.")
-                            
-                    except Exception as e:
-                        st.sidebar.error(f"❌ Export error: {str(e)}")
-            else:
-                st.sidebar.warning("⚠️ No data available for export. Please fetch data first.")
+        with st.sidebar:
+            export_panel(processed_df, insights, export_key, export_format, "sidebar")
     else:
         st.sidebar.warning("⚠️ No data available for export. Please fetch data first.")
     
@@ -1706,83 +1625,85 @@ def main():
         """, unsafe_allow_html=True)
     
     # Main content tabs with enhanced styling
-    tab1, tab2, tab3 = st.tabs(["📊 Charts & Analytics", "📋 Data Tables", "💡 AI Insights"])
+    tab1, tab2, tab3 = lazy_tabs(["📊 Charts & Analytics", "📋 Data Tables", "💡 AI Insights"], key="main_tabs")
     
     with tab1:
-        create_charts(processed_df, insights)
+        if tab_open(tab1):
+            create_charts(processed_df, insights)
     
     with tab2:
-        display_tables(processed_df, insights)
+        if tab_open(tab2):
+            display_tables(processed_df, insights, insights['cube'], export_key)
     
     with tab3:
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("💡 AI-Powered Insights & Analysis")
-        st.markdown("</div>", unsafe_allow_html=True)
-        
-        # Generate and display insights with better styling
-        insights_text = generate_insights(insights)
-        st.markdown('<div class="insight-box">', unsafe_allow_html=True)
-        st.markdown("**🔍 Key Insights**")
-        st.markdown(insights_text)
-        st.markdown("</div>", unsafe_allow_html=True)
-        
-        # AI-powered insights with Gemini
-        st.markdown('<div class="insight-box">', unsafe_allow_html=True)
-        st.markdown("**🤖 AI-Powered Analysis**")
-        gemini_insights = generate_gemini_insights(insights, processed_df)
-        st.markdown(gemini_insights)
-        st.markdown("</div>", unsafe_allow_html=True)
-        
-        # Additional analysis with enhanced styling
-        st.markdown('<div class="insight-box">', unsafe_allow_html=True)
-        st.markdown("**📊 Detailed Market Analysis**")
-        
-        if 'popular_routes' in insights and insights['popular_routes']:
-            st.markdown("**🏆 Top 5 Most Popular Routes:**")
-            for i, (route, count) in enumerate(insights['popular_routes'].items(), 1):
-                st.markdown(f"**{i}.** {route}: **{count} flights**")
-        else:
-            st.markdown("**🏆 Popular Routes:** No route data available")
-        
-        if 'demand_periods' in insights and not insights['demand_periods'].empty:
-            st.markdown("**📈 Demand Analysis:**")
-            try:
-                avg_daily_flights = insights['demand_periods']['flight_count'].mean()
-                st.markdown(f"**Average daily flights:** {avg_daily_flights:.1f}")
-                
-                # Identify peak and low demand days
-                peak_day = insights['demand_periods'].loc[insights['demand_periods']['flight_count'].idxmax()]
-                low_day = insights['demand_periods'].loc[insights['demand_periods']['flight_count'].idxmin()]
-                
-                st.markdown(f"**Peak demand day:** {peak_day['date'].strftime('%Y-%m-%d')} (**{peak_day['flight_count']} flights**)")
-                st.markdown(f"**Lowest demand day:** {low_day['date'].strftime('%Y-%m-%d')} (**{low_day['flight_count']} flights**)")
+        if tab_open(tab3):
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            st.subheader("💡 AI-Powered Insights & Analysis")
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            # Generate and display insights with better styling
+            insights_text = generate_insights(insights)
+            st.markdown('<div class="insight-box">', unsafe_allow_html=True)
+            st.markdown("**🔍 Key Insights**")
+            st.markdown(insights_text)
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            # AI-powered insights with Gemini
+            st.markdown('<div class="insight-box">', unsafe_allow_html=True)
+            st.markdown("**🤖 AI-Powered Analysis**")
+            gemini_panel(processed_df)
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            # Additional analysis with enhanced styling
+            st.markdown('<div class="insight-box">', unsafe_allow_html=True)
+            st.markdown("**📊 Detailed Market Analysis**")
+            
+            if 'popular_routes' in insights and insights['popular_routes']:
+                st.markdown("**🏆 Top 5 Most Popular Routes:**")
+                for i, (route, count) in enumerate(insights['popular_routes'].items(), 1):
+                    st.markdown(f"**{i}.** {route}: **{count} flights**")
+            else:
+                st.markdown("**🏆 Popular Routes:** No route data available")
+            
+            if 'demand_periods' in insights and not insights['demand_periods'].empty:
+                st.markdown("**📈 Demand Analysis:**")
+                try:
+                    avg_daily_flights = insights['demand_periods']['flight_count'].mean()
+                    st.markdown(f"**Average daily flights:** {avg_daily_flights:.1f}")
+                    
+                    # Identify peak and low demand days
+                    peak_day = insights['demand_periods'].loc[insights['demand_periods']['flight_count'].idxmax()]
+                    low_day = insights['demand_periods'].loc[insights['demand_periods']['flight_count'].idxmin()]
+                    
+                    st.markdown(f"**Peak demand day:** {peak_day['date'].strftime('%Y-%m-%d')} (**{peak_day['flight_count']} flights**)")
+                    st.markdown(f"**Lowest demand day:** {low_day['date'].strftime('%Y-%m-%d')} (**{low_day['flight_count']} flights**)")
+                    
+                    # Add demand trend analysis
+                    if len(insights['demand_periods']) > 1:
+                        demand_trend = insights['demand_periods']['flight_count'].iloc[-1] - insights['demand_periods']['flight_count'].iloc[0]
+                        if demand_trend > 0:
+                            st.success(f"📈 **Demand Trend:** Increasing (+{demand_trend:.0f} flights)")
+                        elif demand_trend < 0:
+                            st.error(f"📉 **Demand Trend:** Decreasing ({demand_trend:.0f} flights)")
+                        else:
+                            st.info("➡️ **Demand Trend:** Stable")
+                            
+                except Exception as e:
+                    st.error(f"**Demand Analysis:** Unable to analyze demand patterns: {str(e)}")
+            else:
+                st.markdown("**📈 Demand Analysis:** No demand data available")
+            
+            # Revenue analysis
+            if 'total_revenue' in insights and insights['total_revenue'] > 0:
+                st.markdown("**💰 Revenue Analysis:**")
+                avg_revenue_per_flight = insights['total_revenue'] / insights['total_flights'] if insights['total_flights'] > 0 else 0
+                st.markdown(f"**Average revenue per flight:** ${avg_revenue_per_flight:.2f}")
                 
-                # Add demand trend analysis
-                if len(insights['demand_periods']) > 1:
-                    demand_trend = insights['demand_periods']['flight_count'].iloc[-1] - insights['demand_periods']['flight_count'].iloc[0]
-                    if demand_trend > 0:
-                        st.success(f"📈 **Demand Trend:** Increasing (+{demand_trend:.0f} flights)")
-                    elif demand_trend < 0:
-                        st.error(f"📉 **Demand Trend:** Decreasing ({demand_trend:.0f} flights)")
-                    else:
-                        st.info("➡️ **Demand Trend:** Stable")
-                        
-            except Exception as e:
-                st.error(f"**Demand Analysis:** Unable to analyze demand patterns: {str(e)}")
-        else:
-            st.markdown("**📈 Demand Analysis:** No demand data available")
-        
-        # Revenue analysis
-        if 'total_revenue' in insights and insights['total_revenue'] > 0:
-            st.markdown("**💰 Revenue Analysis:**")
-            avg_revenue_per_flight = insights['total_revenue'] / insights['total_flights'] if insights['total_flights'] > 0 else 0
-            st.markdown(f"**Average revenue per flight:** ${avg_revenue_per_flight:.2f}")
+                if 'avg_occupancy' in insights and insights['avg_occupancy'] > 0:
+                    revenue_per_passenger = insights['total_revenue'] / (insights['total_flights'] * insights['avg_occupancy'] / 100) if insights['total_flights'] > 0 else 0
+                    st.markdown(f"**Revenue per passenger:** ${revenue_per_passenger:.2f}")
             
-            if 'avg_occupancy' in insights and insights['avg_occupancy'] > 0:
-                revenue_per_passenger = insights['total_revenue'] / (insights['total_flights'] * insights['avg_occupancy'] / 100) if insights['total_flights'] > 0 else 0
-                st.markdown(f"**Revenue per passenger:** ${revenue_per_passenger:.2f}")
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+            st.markdown("</div>", unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
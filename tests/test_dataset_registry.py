@@ -0,0 +1,42 @@
+"""
+Leases and eviction in the shared dataset registry.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+
+def test_expired_leases_are_pruned():
+    registry = core.DatasetRegistry(memory_limit=10 ** 6, ttl=60, lease_seconds=0.05)
+    for number in range(100):
+        registry.get_or_create(('flights',), lambda: ('dataset', 10), session_id=f"session-{number}")
+
+    time.sleep(0.1)
+    registry.get_or_create(('flights',), lambda: ('dataset', 10), session_id='active')
+
+    assert list(registry.leases) == ['active']
+    assert registry.stats()['sessions'] == 1
+
+
+def test_clear_drops_leases():
+    registry = core.DatasetRegistry(memory_limit=10 ** 6, ttl=60, lease_seconds=60)
+    registry.get_or_create(('flights',), lambda: ('dataset', 10), session_id='viewer')
+
+    registry.clear()
+
+    assert registry.stats() == {'datasets': 0, 'bytes': 0, 'sessions': 0}
+    assert registry.refcount(('flights',)) == 0
+
+
+def test_unreferenced_datasets_are_evicted_first():
+    registry = core.DatasetRegistry(memory_limit=250, ttl=60, lease_seconds=60)
+    registry.get_or_create(('viewed',), lambda: ('viewed', 100), session_id='viewer')
+    registry.get_or_create(('idle',), lambda: ('idle', 100))
+    registry.get_or_create(('new',), lambda: ('new', 100), session_id='other')
+
+    assert list(registry.entries) == [('viewed',), ('new',)]
@@ -0,0 +1,46 @@
+"""
+Eviction of finished background export jobs.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+
+def finish(jobs: core.ExportJobs, key: str, size: int) -> None:
+    jobs.submit((key, 'csv'), lambda progress: b'x' * size)['future'].result()
+    # The single worker runs the job's done callbacks before its next task
+    jobs.executor.submit(lambda: None).result()
+
+
+def test_finished_exports_are_bounded_by_bytes():
+    jobs = core.ExportJobs(max_jobs=8, workers=1, max_bytes=250)
+
+    finish(jobs, 'a', 100)
+    finish(jobs, 'b', 100)
+    jobs.get(('a', 'csv'))
+    finish(jobs, 'c', 100)
+
+    # The least recently used exports go first until the kept files fit again
+    assert list(jobs.jobs) == [('a', 'csv'), ('c', 'csv')]
+
+
+def test_newest_export_is_kept_even_when_larger_than_the_budget():
+    jobs = core.ExportJobs(max_jobs=8, workers=1, max_bytes=250)
+
+    finish(jobs, 'a', 100)
+    finish(jobs, 'b', 1000)
+
+    assert list(jobs.jobs) == [('b', 'csv')]
+
+
+def test_finished_exports_are_bounded_by_count():
+    jobs = core.ExportJobs(max_jobs=2, workers=1, max_bytes=10 ** 6)
+
+    for key in ['a', 'b', 'c']:
+        finish(jobs, key, 10)
+
+    assert list(jobs.jobs) == [('b', 'csv'), ('c', 'csv')]
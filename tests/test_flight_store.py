@@ -0,0 +1,69 @@
+"""
+Round trips through the local Parquet flight store.
+"""
+
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+
+pa = pytest.importorskip('pyarrow')
+ds = pytest.importorskip('pyarrow.dataset')
+
+DAY = date(2024, 6, 1)
+
+
+def flights(count: int, day: date = DAY, prefix: str = 'F') -> pd.DataFrame:
+    return core.enforce_flight_schema(pd.DataFrame({
+        'date': pd.to_datetime([day] * count),
+        'departure_city': [f"{prefix}{number}" for number in range(count)],
+        'destination_city': ['Chicago'] * count,
+        'airline': [f"Airline {number}" for number in range(count)],
+        'flight_number': [f"{prefix}{number}" for number in range(count)],
+        'price': [300.0] * count,
+        'capacity': [200] * count,
+        'occupancy': [150] * count
+    }))
+
+
+@pytest.fixture
+def store_dir(monkeypatch, tmp_path):
+    path = str(tmp_path / 'flights')
+    monkeypatch.setattr(core, 'FLIGHT_STORE_DIR', path)
+    return path
+
+
+def test_mixed_cardinality_partitions_read_back(store_dir):
+    # Fewer than 128 categories fit an int8 dictionary index, 400 do not; the
+    # narrow file sorts first, so it would set the schema of the dataset
+    core.append_to_flight_store(flights(10, prefix='S'), source='narrow')
+    core.append_to_flight_store(flights(400, prefix='L'), source='wide')
+    core.append_to_flight_store(flights(400, day=date(2024, 6, 2), prefix='N'), source='wide')
+
+    stored = core.read_flight_store(DAY, date(2024, 6, 2))
+
+    assert stored is not None and len(stored) == 810
+    assert isinstance(stored['airline'].dtype, pd.CategoricalDtype)
+    assert stored['airline'].nunique() == 400
+
+
+def test_reads_dictionary_files_with_different_index_widths(store_dir):
+    # Files written before categoricals were stored as plain strings
+    partitioning = ds.partitioning(pa.schema([('date', pa.date32())]), flavor='hive')
+    for name, count in [('narrow', 10), ('wide', 400)]:
+        frame = flights(count, prefix=name).drop(columns=['route'])
+        frame['date'] = frame['date'].dt.date
+        ds.write_dataset(pa.Table.from_pandas(frame, preserve_index=False), store_dir, format='parquet',
+                         partitioning=partitioning, basename_template=f"{name}-{{i}}.parquet",
+                         existing_data_behavior='overwrite_or_ignore')
+
+    stored = core.read_flight_store(DAY, DAY)
+
+    assert stored is not None and len(stored) == 410
@@ -0,0 +1,53 @@
+"""
+AI insights through the offline 'stub' provider and the on-disk answer cache.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+
+SUMMARY = {
+    'total_flights': 1200,
+    'date_range': '2024-06-01 to 2024-06-30',
+    'airlines': 8,
+    'routes': 150,
+    'avg_price': '$412.50',
+    'avg_occupancy': '78.4%'
+}
+
+
+def test_stub_insights_are_cached_on_disk(monkeypatch, tmp_path):
+    cache_dir = tmp_path / 'insights'
+    monkeypatch.setattr(core, 'INSIGHT_CACHE_DIR', str(cache_dir))
+    prompts = []
+
+    def ask(prompt: str) -> str:
+        prompts.append(prompt)
+        return core.ask_stub(prompt)
+
+    monkeypatch.setitem(core.INSIGHT_PROVIDERS, 'stub', ask)
+
+    first = core.generate_gemini_insights(SUMMARY, provider='stub')
+    second = core.generate_gemini_insights(SUMMARY, provider='stub')
+
+    assert first.startswith("🤖 **AI-Powered Insights**")
+    assert "- Stub insight on Total Flights: 1200" in first
+    assert second == first
+    assert len(prompts) == 1
+    key = core.insight_cache_key(SUMMARY, 'stub')
+    assert os.listdir(cache_dir) == [f"{key}.json"]
+    assert core.read_cached_insight(key) is not None
+
+
+def test_changed_summary_misses_the_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(core, 'INSIGHT_CACHE_DIR', str(tmp_path / 'insights'))
+
+    first = core.generate_gemini_insights(SUMMARY, provider='stub')
+    second = core.generate_gemini_insights({**SUMMARY, 'total_flights': 1300}, provider='stub')
+
+    assert "Total Flights: 1300" in second and second != first
+    assert len(os.listdir(tmp_path / 'insights')) == 2
@@ -0,0 +1,170 @@
+"""
+Provider fetches against a local stub of the AviationStack and OpenSky APIs.
+
+The stub serves AVIATIONSTACK_URL and OPENSKY_URL from a ThreadingHTTPServer,
+so the real HTTP session, rate limiter, retry and paging code paths run.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+
+AVIATIONSTACK_TOTAL = 250
+THROTTLED_OFFSET = 100
+OPENSKY_FLIGHTS = 3
+
+
+def aviationstack_record(number: int) -> dict:
+    return {
+        'flight_date': time.strftime('%Y-%m-%d'),
+        'departure': {'airport': 'John F Kennedy International'},
+        'arrival': {'airport': 'Los Angeles International'},
+        'airline': {'name': 'Delta Air Lines'},
+        'flight': {'iata': f"DL{number}"}
+    }
+
+
+def opensky_record(number: int, first_seen: int) -> dict:
+    return {
+        'firstSeen': first_seen,
+        'estDepartureAirport': 'EDDF',
+        'estArrivalAirport': 'EGLL',
+        'callsign': f"DLH{number:<5}"
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        self.server.requests.append((url.path, params))
+
+        if url.path == '/aviationstack':
+            offset = int(params['offset'])
+            # Throttle the first request for one page to exercise the retry
+            if offset == THROTTLED_OFFSET and offset not in self.server.throttled:
+                self.server.throttled.add(offset)
+                self.respond(429, {'error': 'rate limited'}, {'Retry-After': '0'})
+                return
+            numbers = range(offset, min(offset + int(params['limit']), AVIATIONSTACK_TOTAL))
+            self.respond(200, {
+                'pagination': {'offset': offset, 'limit': int(params['limit']), 'total': AVIATIONSTACK_TOTAL},
+                'data': [aviationstack_record(number) for number in numbers]
+            })
+        elif url.path == '/opensky':
+            first_seen = int(params['begin'])
+            # Callsigns differ between slices so stored flights stay distinct
+            first = first_seen // core.OPENSKY_SLICE_SECONDS % 1000 * OPENSKY_FLIGHTS
+            self.respond(200, [opensky_record(number, first_seen) for number in range(first, first + OPENSKY_FLIGHTS)])
+        else:
+            self.respond(404, {})
+
+    def respond(self, status: int, body, headers: dict = None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    server.throttled = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(core, 'AVIATIONSTACK_URL', f"{base_url}/aviationstack")
+    monkeypatch.setattr(core, 'OPENSKY_URL', f"{base_url}/opensky")
+    monkeypatch.setattr(core, 'AVIATIONSTACK_API_KEY', 'test-key')
+    monkeypatch.setattr(core, 'FLIGHT_STORE_DIR', str(tmp_path / 'flights'))
+    monkeypatch.setattr(core, 'HTTP_BACKOFF_SECONDS', 0.01)
+    monkeypatch.setitem(core.PROVIDER_RATE_LIMITS, 'aviationstack', (1000.0, 10))
+    monkeypatch.setitem(core.PROVIDER_RATE_LIMITS, 'opensky', (1000.0, 10))
+    core.get_rate_limiter.cache_clear()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    core.get_rate_limiter.cache_clear()
+
+
+def aviationstack_offsets(server) -> list:
+    return sorted(int(params['offset']) for path, params in server.requests if path == '/aviationstack')
+
+
+def test_fetch_all_providers_merges_pages_and_opensky(stub_server):
+    results = core.fetch_all_providers()
+    merged = core.merge_provider_data(results)
+
+    assert len(results['AviationStack API']) == AVIATIONSTACK_TOTAL
+    assert len(results['OpenSky Network API']) == OPENSKY_FLIGHTS
+    assert len(merged) == AVIATIONSTACK_TOTAL + OPENSKY_FLIGHTS
+    assert set(merged['flight_number'].astype(str)) >= {'DL0', 'DL249'}
+    assert merged['airline'].astype(str).value_counts()['DLH'] == OPENSKY_FLIGHTS
+    assert set(merged['route'].astype(str)) == {
+        'John F Kennedy International → Los Angeles International', 'EDDF → EGLL'
+    }
+
+
+def test_aviationstack_walks_every_page(stub_server):
+    df = core.fetch_aviationstack_data()
+
+    assert len(df) == AVIATIONSTACK_TOTAL
+    assert df['flight_number'].astype(str).nunique() == AVIATIONSTACK_TOTAL
+    assert set(aviationstack_offsets(stub_server)) == {0, 100, 200}
+
+
+def test_aviationstack_retries_throttled_page(stub_server):
+    df = core.fetch_aviationstack_data()
+
+    # The 429 page is requested again and its flights are not lost
+    assert aviationstack_offsets(stub_server).count(THROTTLED_OFFSET) == 2
+    assert {f"DL{number}" for number in range(100, 200)} <= set(df['flight_number'].astype(str))
+    assert core.get_rate_limiter('aviationstack').metrics()['throttled'] == 1
+
+
+def test_backfill_keeps_slices_when_one_fails(stub_server, monkeypatch):
+    day = date.today() - timedelta(days=1)
+    slices = core.opensky_time_slices(day, day)
+    failing_begin = slices[5][0]
+    fetch_slice = core.fetch_opensky_slice
+
+    def flaky_slice(session, begin, end, **kwargs):
+        if begin == failing_begin:
+            raise requests.ConnectionError("connection reset")
+        return fetch_slice(session, begin, end, **kwargs)
+
+    monkeypatch.setattr(core, 'fetch_opensky_slice', flaky_slice)
+    monkeypatch.setattr(core, 'OPENSKY_BACKFILL_FLUSH_SLICES', 4)
+    fractions = []
+
+    df = core.backfill_opensky_data(day, day, progress=fractions.append)
+    stored = core.read_flight_store(day, day)
+
+    expected = (len(slices) - 1) * OPENSKY_FLIGHTS
+    assert len(df) == expected
+    assert stored is not None and len(stored) == expected
+    assert fractions[-1] == 1.0